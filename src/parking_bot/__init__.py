@@ -1,8 +1,14 @@
 __all__ = [
+    "background",
     "bot",
+    "classifier",
     "cli",
     "config",
     "detect",
+    "history",
+    "registration",
+    "scheduler",
     "spots",
+    "video",
     "viz",
 ]
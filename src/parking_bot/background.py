@@ -0,0 +1,174 @@
+import threading
+
+import cv2
+import numpy as np
+
+from .detect import Detection, VehicleDetector, centers_from_detections
+from .profiling import span
+from .spots import Spot, SpotIndex, SpotLayout, scale_spots
+
+EMPTY = 0
+OCCUPIED = 1
+AMBIGUOUS = -1
+
+_HIST_BINS = 16
+
+
+def warp_patches(bgr: np.ndarray, spots: list[Spot], side: int) -> np.ndarray:
+    """Every spot polygon warped to a `side` x `side` patch, stacked as (n, side, side, 3) uint8.
+
+    Quadrilaterals are perspective-normalised; other polygons use their bounding box.
+    """
+    out = np.zeros((len(spots), side, side, 3), dtype=np.uint8)
+    dst = np.array([[0, 0], [side - 1, 0], [side - 1, side - 1], [0, side - 1]], dtype=np.float32)
+    h, w = bgr.shape[:2]
+    for i, s in enumerate(spots):
+        pts = np.asarray(s.polygon, dtype=np.float32).reshape(-1, 2)
+        if len(pts) == 4:
+            m = cv2.getPerspectiveTransform(pts, dst)
+            out[i] = cv2.warpPerspective(bgr, m, (side, side), flags=cv2.INTER_AREA, borderMode=cv2.BORDER_REPLICATE)
+            continue
+        if len(pts) == 0:
+            continue
+        x1, y1 = np.clip(pts.min(axis=0).astype(int), 0, (w - 1, h - 1))
+        x2, y2 = np.clip(np.ceil(pts.max(axis=0)).astype(int) + 1, (x1 + 1, y1 + 1), (w, h))
+        out[i] = cv2.resize(bgr[y1:y2, x1:x2], (side, side), interpolation=cv2.INTER_AREA)
+    return out
+
+
+def patch_features(patches: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(n, 16) histograms of contrast-normalised gray values and (n,) edge densities, computed for all patches at once."""
+    gray = patches.astype(np.float32) @ np.array([0.114, 0.587, 0.299], dtype=np.float32)  # BGR -> Y
+    # per-patch mean/std normalisation makes the histogram insensitive to global lighting changes
+    mu = gray.mean(axis=(1, 2), keepdims=True)
+    sd = gray.std(axis=(1, 2), keepdims=True) + 8.0
+    z = np.clip((gray - mu) / sd * (_HIST_BINS / 6) + _HIST_BINS / 2, 0, _HIST_BINS - 1).astype(np.intp)
+    n, side = len(patches), patches.shape[1]
+    # one bincount for all patches: bin k of patch i lands at i * bins + k
+    z += (np.arange(n) * _HIST_BINS)[:, None, None]
+    hist = np.bincount(z.ravel(), minlength=n * _HIST_BINS).reshape(n, _HIST_BINS).astype(np.float32)
+    hist /= side * side
+
+    gx = np.abs(np.diff(gray, axis=2))[:, 1:, :]
+    gy = np.abs(np.diff(gray, axis=1))[:, :, 1:]
+    edges = ((gx + gy) > 24.0).mean(axis=(1, 2), dtype=np.float32)
+    return hist, edges
+
+
+class EmptyLotModel:
+    """Per-spot appearance of the empty spot, learned from frames where the detector saw it free.
+
+    `classify` compares each spot's patch against that background: a close match is EMPTY, a large
+    difference OCCUPIED, anything in between (or a spot without enough background samples) AMBIGUOUS.
+    """
+
+    def __init__(
+        self,
+        spot_ids: list[str],
+        patch: int = 32,
+        empty_thres: float = 0.12,
+        occupied_thres: float = 0.35,
+        min_samples: int = 3,
+        rate: float = 0.1,
+    ):
+        self.spot_ids = list(spot_ids)
+        self.patch = int(patch)
+        self.empty_thres = float(empty_thres)
+        self.occupied_thres = float(occupied_thres)
+        self.min_samples = int(min_samples)
+        self.rate = float(rate)
+        n = len(self.spot_ids)
+        self.hist = np.zeros((n, _HIST_BINS), dtype=np.float32)
+        self.edges = np.zeros(n, dtype=np.float32)
+        self.samples = np.zeros(n, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    def features(self, bgr: np.ndarray, spots: list[Spot]) -> tuple[np.ndarray, np.ndarray]:
+        return patch_features(warp_patches(bgr, spots, self.patch))
+
+    def distance(self, hist: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        # half L1 between histograms is in [0, 1]; edge density of a car is several times the asphalt's
+        with self._lock:
+            d_hist = 0.5 * np.abs(hist - self.hist).sum(axis=1)
+            d_edge = np.abs(edges - self.edges) / np.maximum(self.edges, 0.02)
+        return d_hist + 0.25 * d_edge
+
+    def classify(self, hist: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """EMPTY / OCCUPIED / AMBIGUOUS per spot, in `spot_ids` order."""
+        d = self.distance(hist, edges)
+        state = np.full(len(d), AMBIGUOUS, dtype=np.int8)
+        state[d <= self.empty_thres] = EMPTY
+        state[d >= self.occupied_thres] = OCCUPIED
+        with self._lock:
+            state[self.samples < self.min_samples] = AMBIGUOUS
+        return state
+
+    def update(self, hist: np.ndarray, edges: np.ndarray, empty: np.ndarray) -> None:
+        """Blend features of spots seen `empty` into the background (plain mean for the first samples)."""
+        empty = np.asarray(empty, dtype=bool)
+        if not empty.any():
+            return
+        with self._lock:
+            k = self.samples[empty]
+            a = np.maximum(self.rate, 1.0 / (k + 1))[:, None]
+            self.hist[empty] += a * (hist[empty] - self.hist[empty])
+            self.edges[empty] += a[:, 0] * (edges[empty] - self.edges[empty])
+            self.samples[empty] = k + 1
+
+    def seed(self, bgr: np.ndarray, spots: list[Spot]) -> None:
+        """Initialise every spot from a reference image of the empty lot."""
+        hist, edges = self.features(bgr, spots)
+        empty = np.ones(len(spots), dtype=bool)
+        for _ in range(self.min_samples):
+            self.update(hist, edges, empty)
+
+
+class FastPath:
+    """Runs the detector only when the background model is unsure about some spot.
+
+    Every `recheck_every`-th call runs the detector anyway, so the background keeps learning and a
+    drifting model cannot keep answering on its own.
+    """
+
+    def __init__(self, model: EmptyLotModel, recheck_every: int = 30):
+        self.model = model
+        self.recheck_every = max(1, int(recheck_every))
+        self.calls = 0
+        self.skipped = 0
+        self._since_check = 0
+        # bot workers share one FastPath; counters are only touched under this lock
+        self._lock = threading.Lock()
+
+    def occupancy(
+        self, detector: VehicleDetector, bgr: np.ndarray, spots: list[Spot], index: SpotIndex
+    ) -> tuple[dict[str, bool], list[Detection]]:
+        """Same output as `detect` + `SpotIndex.occupancy`; detections are empty when the DNN was skipped."""
+        with span("background"):
+            hist, edges = self.model.features(bgr, spots)
+            state = self.model.classify(hist, edges)
+        with self._lock:
+            self.calls += 1
+            self._since_check += 1
+            skip = len(state) and (state != AMBIGUOUS).all() and self._since_check < self.recheck_every
+            if skip:
+                self.skipped += 1
+            else:
+                self._since_check = 0
+        if skip:
+            return {s.spot_id: bool(v == OCCUPIED) for s, v in zip(spots, state)}, []
+
+        dets = detector.detect(bgr, index)
+        occ = index.occupancy(centers_from_detections(dets))
+        self.model.update(hist, edges, np.array([not occ[s.spot_id] for s in spots], dtype=bool))
+        return occ, dets
+
+
+def new_fast_path(layout: SpotLayout, empty_lot_image: str | None = None) -> FastPath:
+    """Fast path for a layout, optionally seeded from a photo of the empty lot (any resolution)."""
+    model = EmptyLotModel([s.spot_id for s in layout.spots_cfg.spots])
+    if empty_lot_image:
+        img = cv2.imread(empty_lot_image)
+        if img is None:
+            raise RuntimeError(f"Cannot read empty-lot image: {empty_lot_image}")
+        model.seed(img, scale_spots(layout.spots_cfg, (img.shape[1], img.shape[0])))
+    return FastPath(model)
@@ -1,27 +1,117 @@
+import argparse
+import asyncio
+import math
 import tempfile
+from dataclasses import replace
 from pathlib import Path
 
 import cv2
 from telegram import Update
 from telegram.constants import ChatAction
+from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
-from .config import load_settings
-from .detect import VehicleDetector, centers_from_detections
-from .spots import load_spots, scale_spots, spot_occupied
+from .background import FastPath, new_fast_path
+from .classifier import SpotClassifier
+from .config import Settings, load_settings
+from .detect import VehicleDetector, centers_from_detections, set_thread_budget, thread_budget
+from . import profiling
+from .history import OccupancyStore, layout_signature
+from .scheduler import QueueFull, RateLimiter, Scheduler
+from .registration import CameraAligner, new_aligner
+from .spots import SpotLayout, load_layout
+from .video import expected_frames, fit_size, iter_frames, video_info, width_for_budget
 from .viz import draw_overlay
 
 
-def _analyze_bgr(detector: VehicleDetector, spots_path: str, bgr):
-    spots_cfg = load_spots(spots_path)
-    dets = detector.detect(bgr)
-    centers = centers_from_detections(dets)
-    spots = scale_spots(spots_cfg, (bgr.shape[1], bgr.shape[0]))
-    occ = {s.spot_id: spot_occupied(s, centers) for s in spots}
-    overlay = draw_overlay(bgr, spots, occ, detections=dets)
+def _occupancy(detector: VehicleDetector, engine: FastPath | SpotClassifier | None, bgr, spots, index):
+    # safe from any worker: the detector and the classifier lend each caller its own net
+    with profiling.span("occupancy"):
+        if engine is not None:
+            return engine.occupancy(detector, bgr, spots, index)
+        dets = detector.detect(bgr, index)
+    return index.occupancy(centers_from_detections(dets)), dets
+
+
+def _aligned(layout: SpotLayout, aligner: CameraAligner | None, bgr, size: tuple[int, int]):
+    """`layout.scaled(size)`, warped onto where the camera currently points when alignment is on."""
+    if aligner is None:
+        return layout.scaled(size)
+    return layout.scaled(size, aligner.homography(bgr, layout.spots_cfg.image_size))
+
+
+def _analyze_bgr(
+    detector: VehicleDetector,
+    spots_path: str,
+    bgr,
+    engine: FastPath | SpotClassifier | None = None,
+    aligner: CameraAligner | None = None,
+):
+    layout = load_layout(spots_path)
+    spots, index = _aligned(layout, aligner, bgr, (bgr.shape[1], bgr.shape[0]))
+    occ, dets = _occupancy(detector, engine, bgr, spots, index)
+    with profiling.span("overlay"):
+        overlay = draw_overlay(bgr, spots, occ, detections=dets)
     total = len(spots)
     free = sum(1 for s in spots if not occ.get(s.spot_id, False))
-    return overlay, free, total
+    return overlay, free, total, occ
+
+
+def _history_store(context: ContextTypes.DEFAULT_TYPE, spot_ids: list[str]) -> OccupancyStore | None:
+    settings = context.application.bot_data["settings"]
+    if not settings.history_dir:
+        return None
+    stores: dict[str, OccupancyStore] = context.application.bot_data.setdefault("history", {})
+    key = layout_signature(spot_ids)
+    if key not in stores:
+        stores[key] = OccupancyStore(settings.history_dir, spot_ids)
+    return stores[key]
+
+
+def _engine(context: ContextTypes.DEFAULT_TYPE) -> FastPath | SpotClassifier | None:
+    """Occupancy engine used instead of plain detection (None = detector + center-in-polygon)."""
+    settings = context.application.bot_data["settings"]
+    if settings.occupancy_engine == "classifier":
+        return context.application.bot_data["classifier"]
+    if not settings.empty_fast_path:
+        return None
+    layout = load_layout(settings.spots_path)
+    paths: dict[str, FastPath] = context.application.bot_data.setdefault("fast_path", {})
+    key = layout_signature([s.spot_id for s in layout.spots_cfg.spots])
+    if key not in paths:
+        paths[key] = new_fast_path(layout, settings.empty_lot_image)
+    return paths[key]
+
+
+# a video costs this many photos' worth of a user's rate limit
+_VIDEO_COST = 3.0
+# admission control never samples more than this many times sparser than configured
+_MAX_SHED = 4
+
+
+def _admit(context: ContextTypes.DEFAULT_TYPE, update: Update, lane: str, cost: float) -> str | None:
+    """None if the request may be queued, otherwise the reply explaining why not."""
+    scheduler: Scheduler = context.application.bot_data["scheduler"]
+    limiter: RateLimiter = context.application.bot_data["limiter"]
+    user = update.effective_user or update.effective_chat
+    ok, wait_s = limiter.take(user.id if user is not None else 0, cost)
+    if not ok:
+        return f"Слишком много запросов. Попробуй через {math.ceil(wait_s)} с."
+    if scheduler.full(lane):
+        return "Сервер занят: очередь заполнена. Попробуй позже."
+    return None
+
+
+def _shed_load(settings: Settings, backlog: int) -> Settings:
+    """With `backlog` videos waiting, sample frames k times sparser and stop k times earlier (k <= 4)."""
+    k = min(_MAX_SHED, 1 + max(0, backlog))
+    if k == 1:
+        return settings
+    return replace(
+        settings,
+        video_every=settings.video_every * k,
+        video_max_frames=max(1, settings.video_max_frames // k) if settings.video_max_frames else 0,
+    )
 
 
 def _make_writer(path: Path, fps: float, size: tuple[int, int]) -> cv2.VideoWriter:
@@ -48,6 +138,12 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def on_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     settings = context.application.bot_data["settings"]
     detector: VehicleDetector = context.application.bot_data["detector"]
+    scheduler: Scheduler = context.application.bot_data["scheduler"]
+
+    refusal = _admit(context, update, "photo", 1.0)
+    if refusal:
+        await update.message.reply_text(refusal)
+        return
 
     await update.message.chat.send_action(ChatAction.UPLOAD_PHOTO)
 
@@ -64,19 +160,118 @@ async def on_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.message.reply_text("Не смог прочитать изображение")
             return
 
-        overlay, free, total = _analyze_bgr(detector, settings.spots_path, bgr)
+        async def queued(pos: int) -> None:
+            await update.message.reply_text(f"Сервер занят, позиция в очереди: {pos}")
+
+        try:
+            overlay, free, total, occ = await scheduler.run(
+                "photo",
+                _analyze_bgr,
+                detector,
+                settings.spots_path,
+                bgr,
+                _engine(context),
+                context.application.bot_data.get("photo_aligner"),
+                on_queued=queued,
+            )
+        except QueueFull:
+            await update.message.reply_text("Сервер занят: очередь заполнена. Попробуй позже.")
+            return
         cv2.imwrite(str(out_path), overlay)
 
+        history = _history_store(context, list(occ))
+        if history is not None:
+            history.append(update.message.date.timestamp(), occ)
+            history.flush()
+
         caption = f"Свободно: {free}/{total}"
         await update.message.reply_photo(photo=open(out_path, "rb"), caption=caption)
 
 
+_PROGRESS_EVERY_S = 3.0
+_TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+
+
+def _progress_text(progress: dict) -> str:
+    if "expected" not in progress and progress.get("queued"):
+        return f"Сервер занят, позиция в очереди: {progress['queued']}"
+    done = progress.get("done", 0)
+    expected = progress.get("expected", 0)
+    text = f"Обработка: {done}/{expected} кадров" if expected else f"Обработка: {done} кадров"
+    if done and progress.get("total"):
+        text += (
+            f"\nСвободно сейчас: {progress['free']}/{progress['total']}"
+            f" (мин {progress['min_free']}, макс {progress['max_free']})"
+        )
+    return text
+
+
+def _render_video(
+    detector: VehicleDetector,
+    settings: Settings,
+    cap: cv2.VideoCapture,
+    out_path: Path,
+    history: OccupancyStore | None,
+    start_ts: float,
+    progress: dict,
+    engine: FastPath | SpotClassifier | None = None,
+    aligner: CameraAligner | None = None,
+) -> tuple[int, int]:
+    """Blocking part of `on_video`: runs in a worker thread and reports into `progress`."""
+    layout = load_layout(settings.spots_path)
+    info = video_info(cap)
+    every = int(settings.video_every)
+    w, h = fit_size(info.size, settings.video_max_width)
+    expected = expected_frames(info, every, settings.video_max_frames)
+
+    # pick the output size up front so the file fits the upload limit without a re-encode
+    out_w = width_for_budget((w, h), expected, settings.video_upload_limit_mb * 1024 * 1024)
+    out_size = fit_size((w, h), out_w)
+    writer = _make_writer(out_path, max(1.0, info.fps / max(1, every)), out_size)
+
+    spots, index = layout.scaled((w, h))
+    total = len(spots)
+    progress.update(expected=expected, total=total, done=0)
+
+    frames = iter_frames(
+        cap,
+        every=every,
+        max_frames=settings.video_max_frames,
+        max_width=settings.video_max_width,
+    )
+    free = 0
+    for idx, fr in profiling.iter_span("decode", frames):
+        if aligner is not None:
+            spots, index = _aligned(layout, aligner, fr, (w, h))
+        occ, dets = _occupancy(detector, engine, fr, spots, index)
+        free = sum(1 for s in spots if not occ.get(s.spot_id, False))
+        if history is not None:
+            history.append(start_ts + idx / info.fps, occ)
+
+        with profiling.span("overlay"):
+            overlay = draw_overlay(fr, spots, occ, detections=dets)
+        with profiling.span("encode"):
+            if out_size != (w, h):
+                overlay = cv2.resize(overlay, out_size, interpolation=cv2.INTER_AREA)
+            writer.write(overlay)
+
+        progress.update(
+            done=progress["done"] + 1,
+            free=free,
+            min_free=min(free, progress.get("min_free", free)),
+            max_free=max(free, progress.get("max_free", free)),
+        )
+
+    writer.release()
+    if history is not None:
+        history.flush()
+    return free, total
+
+
 async def on_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     settings = context.application.bot_data["settings"]
     detector: VehicleDetector = context.application.bot_data["detector"]
 
-    await update.message.chat.send_action(ChatAction.UPLOAD_VIDEO)
-
     msg = update.message
     if msg is None:
         return
@@ -85,6 +280,14 @@ async def on_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if vid is None and doc is None:
         return
 
+    scheduler: Scheduler = context.application.bot_data["scheduler"]
+    refusal = _admit(context, update, "video", _VIDEO_COST)
+    if refusal:
+        await msg.reply_text(refusal)
+        return
+
+    status = await msg.reply_text("Скачиваю видео…")
+
     with tempfile.TemporaryDirectory() as td:
         in_path = Path(td) / "in.mp4"
         out_path = Path(td) / "out.mp4"
@@ -92,58 +295,86 @@ async def on_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         file = await (vid.get_file() if vid is not None else doc.get_file())
         await file.download_to_drive(str(in_path))
 
-        spots_cfg = load_spots(settings.spots_path)
         cap = cv2.VideoCapture(str(in_path))
         if not cap.isOpened():
-            await update.message.reply_text("Не смог прочитать видео")
+            await status.edit_text("Не смог прочитать видео")
             return
 
-        fps_in = cap.get(cv2.CAP_PROP_FPS) or 25.0
-        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        every = int(settings.video_every)
-        fps_out = max(1.0, fps_in / max(1, every))
-
-        spots = scale_spots(spots_cfg, (w, h))
-        writer = _make_writer(out_path, fps_out, (w, h))
-
-        idx = 0
-        written = 0
-        last_free = 0
-        total = len(spots)
-
-        while True:
-            ok, fr = cap.read()
-            if not ok or fr is None:
-                break
-            if every > 1 and (idx % every != 0):
-                idx += 1
-                continue
-
-            dets = detector.detect(fr)
-            centers = centers_from_detections(dets)
-            occ = {s.spot_id: spot_occupied(s, centers) for s in spots}
-            last_free = sum(1 for s in spots if not occ.get(s.spot_id, False))
-
-            overlay = draw_overlay(fr, spots, occ, detections=dets)
-            writer.write(overlay)
-            written += 1
-            idx += 1
-
-            if settings.video_max_frames and written >= int(settings.video_max_frames):
-                break
-
-        cap.release()
-        writer.release()
+        layout = load_layout(settings.spots_path)
+        spots, _ = layout.scaled(fit_size(video_info(cap).size, settings.video_max_width))
+        history = _history_store(context, [s.spot_id for s in spots])
+
+        progress: dict = {}
+        engine = _engine(context)
+        aligner = context.application.bot_data.get("video_aligner")
+
+        def render() -> tuple[int, int]:
+            # admission control, decided when the job starts: the more videos wait behind it, the fewer frames
+            job_settings = _shed_load(settings, scheduler.backlog("video"))
+            progress["every"] = job_settings.video_every
+            return _render_video(
+                detector, job_settings, cap, out_path, history, msg.date.timestamp(), progress, engine, aligner
+            )
+
+        last_text = ""
+
+        async def queued(pos: int) -> None:
+            nonlocal last_text
+            progress["queued"] = pos
+            try:
+                last_text = _progress_text(progress)
+                await status.edit_text(last_text)
+            except TelegramError:
+                pass
+
+        task = asyncio.create_task(scheduler.run("video", render, on_queued=queued))
+        try:
+            while True:
+                finished, _ = await asyncio.wait({task}, timeout=_PROGRESS_EVERY_S)
+                if finished:
+                    break
+                text = _progress_text(progress)
+                if text != last_text:
+                    try:
+                        await status.edit_text(text)
+                        last_text = text
+                    except TelegramError:
+                        pass
+                await msg.chat.send_action(ChatAction.UPLOAD_VIDEO)
+            last_free, total = task.result()
+        except QueueFull:
+            await status.edit_text("Сервер занят: очередь заполнена. Попробуй позже.")
+            return
+        finally:
+            cap.release()
+
+        size = out_path.stat().st_size
+        if size > _TELEGRAM_UPLOAD_LIMIT:
+            await status.edit_text(
+                f"Видео получилось слишком большим ({size // (1024 * 1024)} МБ). "
+                f"Свободно (последний кадр): {last_free}/{total}"
+            )
+            return
 
+        await status.edit_text(_progress_text(progress) + "\nОтправляю…")
         caption = f"Свободно (последний кадр): {last_free}/{total}"
+        if progress.get("every", settings.video_every) != settings.video_every:
+            caption += f"\nСервер нагружен: обработан каждый {progress['every']}-й кадр"
         try:
-            await update.message.reply_video(video=open(out_path, "rb"), caption=caption)
+            await msg.reply_video(video=open(out_path, "rb"), caption=caption)
         except Exception:
-            await update.message.reply_document(document=open(out_path, "rb"), caption=caption)
+            await msg.reply_document(document=open(out_path, "rb"), caption=caption)
+        try:
+            await status.delete()
+        except TelegramError:
+            pass
 
 
 def main() -> None:
+    p = argparse.ArgumentParser(description="Telegram bot: photo/video -> free parking spots")
+    profiling.add_argument(p)
+    args = p.parse_args()
+
     settings = load_settings()
     if not settings.telegram_bot_token:
         raise RuntimeError("Missing TELEGRAM_BOT_TOKEN. Put it into ./env and run via docker compose.")
@@ -156,18 +387,55 @@ def main() -> None:
         weights_name=settings.yolo_weights,
         coco_names_name=settings.coco_names,
         ultralytics_model=settings.ultralytics_model,
+        onnx_model=settings.onnx_model,
         conf_thres=settings.conf_thres,
+        input_size=settings.input_size,
     )
-
-    app = Application.builder().token(settings.telegram_bot_token).build()
+    # BOT_WORKERS inferences run at once; each gets its share of the cores instead of all of them
+    set_thread_budget(thread_budget(settings.dnn_threads, settings.bot_workers))
+
+    # handlers only wait on the scheduler, so updates can be handled concurrently
+    builder = Application.builder().token(settings.telegram_bot_token).concurrent_updates(True)
+    if settings.telegram_api_url:
+        # local Bot API server or a stand-in (parking-fake-bot-api)
+        builder = builder.base_url(f"{settings.telegram_api_url}/bot").base_file_url(
+            f"{settings.telegram_api_url}/file/bot"
+        )
+    app = builder.build()
     app.bot_data["settings"] = settings
     app.bot_data["detector"] = detector
+    app.bot_data["scheduler"] = Scheduler(settings.bot_workers, settings.bot_queue_limit)
+    app.bot_data["limiter"] = RateLimiter(settings.user_rate_per_min, settings.user_burst)
+    if settings.occupancy_engine == "classifier":
+        app.bot_data["classifier"] = SpotClassifier(settings.spot_classifier)
+    elif settings.occupancy_engine != "detector":
+        raise ValueError(f"Unknown OCCUPANCY_ENGINE: {settings.occupancy_engine}")
+    if settings.camera_align:
+        # photos are independent snapshots, so the cheap drift check runs on every one;
+        # video frames form a stream and keep the ALIGN_CHECK_EVERY cadence
+        app.bot_data["photo_aligner"] = new_aligner(settings.reference_frame, check_every=1, drift_px=settings.align_drift_px)
+        app.bot_data["video_aligner"] = new_aligner(
+            settings.reference_frame, check_every=settings.align_check_every, drift_px=settings.align_drift_px
+        )
 
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(MessageHandler(filters.PHOTO, on_photo))
     app.add_handler(MessageHandler(filters.VIDEO | filters.Document.VIDEO | filters.Document.MimeType("video/mp4"), on_video))
 
-    app.run_polling(close_loop=False)
+    with profiling.session(args.profile or settings.profile, settings.profile_dir):
+        if settings.webhook_url:
+            # Telegram pushes updates to <WEBHOOK_URL>/<WEBHOOK_PATH>; several replicas may sit behind one
+            # reverse proxy with the same URL, each re-registering it on start
+            app.run_webhook(
+                listen=settings.webhook_listen,
+                port=settings.webhook_port,
+                url_path=settings.webhook_path,
+                webhook_url=f"{settings.webhook_url}/{settings.webhook_path}",
+                secret_token=settings.webhook_secret,
+                close_loop=False,
+            )
+        else:
+            app.run_polling(close_loop=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .background import warp_patches
+from .detect import Detection, NetPool, VehicleDetector
+from .profiling import span
+from .spots import Spot, SpotIndex
+
+
+class SpotClassifier:
+    """Occupancy engine that never looks at the full frame.
+
+    Every spot polygon is perspective-normalised to a small square patch, all patches go through a
+    tiny binary CNN (ONNX, run by cv2.dnn) as one batch, and the "occupied" probability is thresholded.
+    The sidecar `<model>.json` holds the patch side the model was trained with.
+    """
+
+    def __init__(self, model_path: str | Path, threshold: float = 0.5):
+        self.model_path = Path(model_path)
+        if not self.model_path.exists():
+            raise FileNotFoundError(
+                f"Spot classifier not found: {self.model_path}. Train one with parking-train-spot-classifier."
+            )
+        meta_path = self.model_path.with_suffix(".json")
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        self.patch = int(meta.get("patch", 64))
+        self.threshold = float(threshold)
+        self._model_bytes = np.frombuffer(self.model_path.read_bytes(), dtype=np.uint8)
+        # one net per concurrent caller (see `NetPool`)
+        self.pool = NetPool(self._new_net)
+        self.pool.put(self._new_net())
+
+    def _new_net(self) -> cv2.dnn.Net:
+        net = cv2.dnn.readNetFromONNX(self._model_bytes)
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return net
+
+    def scores(self, bgr: np.ndarray, spots: list[Spot]) -> np.ndarray:
+        """Probability that each spot is occupied, in `spots` order."""
+        if not spots:
+            return np.zeros(0, dtype=np.float32)
+        with span("warp"):
+            patches = warp_patches(bgr, spots, self.patch)
+        # same as cv2.dnn.blobFromImages(patches, 1/255, swapRB=True), without the per-image Python list
+        blob = np.ascontiguousarray(patches[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+        blob *= 1 / 255.0
+        with span("forward"), self.pool.acquire() as net:
+            net.setInput(blob)
+            out = np.asarray(net.forward(), dtype=np.float32).reshape(len(spots), -1)
+        if out.shape[1] == 1:
+            return 1.0 / (1.0 + np.exp(-out[:, 0]))
+        e = np.exp(out - out.max(axis=1, keepdims=True))
+        return e[:, 1] / e.sum(axis=1)
+
+    def occupancy(
+        self, detector: VehicleDetector | None, bgr: np.ndarray, spots: list[Spot], index: SpotIndex | None = None
+    ) -> tuple[dict[str, bool], list[Detection]]:
+        """Same shape of result as `FastPath.occupancy`; there are never detections to draw."""
+        with span("classify"):
+            p = self.scores(bgr, spots)
+        return {s.spot_id: bool(v >= self.threshold) for s, v in zip(spots, p)}, []
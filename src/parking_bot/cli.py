@@ -3,20 +3,24 @@ from pathlib import Path
 
 import cv2
 
+from . import profiling
 from .config import load_settings
-from .detect import VehicleDetector, centers_from_detections
-from .spots import load_spots, scale_spots, spot_occupied
+from .detect import VehicleDetector, centers_from_detections, set_thread_budget
+from .registration import new_aligner
+from .spots import load_layout
 from .viz import draw_overlay
 
 
 def main() -> None:
-    p = argparse.ArgumentParser(description="Offline demo: image -> parking occupancy")
+    p = argparse.ArgumentParser(description="Offline demo: image -> parking occupancy (many images: parking-batch)")
     p.add_argument("--image", required=True, help="Path to image (jpg/png)")
     p.add_argument("--out", default="out.png", help="Output image path")
+    p.add_argument("--align", action="store_true", help="Register the image against REFERENCE_FRAME first")
+    profiling.add_argument(p)
     args = p.parse_args()
 
     settings = load_settings()
-    spots_cfg = load_spots(settings.spots_path)
+    layout = load_layout(settings.spots_path)
 
     img = cv2.imread(args.image)
     if img is None:
@@ -29,14 +33,25 @@ def main() -> None:
         weights_name=settings.yolo_weights,
         coco_names_name=settings.coco_names,
         ultralytics_model=settings.ultralytics_model,
+        onnx_model=settings.onnx_model,
         conf_thres=settings.conf_thres,
+        input_size=settings.input_size,
     )
-    dets = det.detect(img)
-    centers = centers_from_detections(dets)
-
-    spots = scale_spots(spots_cfg, (img.shape[1], img.shape[0]))
-    occ = {s.spot_id: spot_occupied(s, centers) for s in spots}
-    out = draw_overlay(img, spots, occ, detections=dets)
+    set_thread_budget(settings.dnn_threads)
+    with profiling.session(args.profile or settings.profile, settings.profile_dir):
+        homography = None
+        if args.align or settings.camera_align:
+            aligner = new_aligner(settings.reference_frame)
+            homography = aligner.homography(img, layout.spots_cfg.image_size)
+            if homography is None:
+                print("Could not register the image against the reference frame; using plain scaling")
+        spots, index = layout.scaled((img.shape[1], img.shape[0]), homography)
+        dets = det.detect(img, index)
+        centers = centers_from_detections(dets)
+
+        occ = index.occupancy(centers)
+        with profiling.span("overlay"):
+            out = draw_overlay(img, spots, occ, detections=dets)
 
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
     cv2.imwrite(args.out, out)
@@ -17,9 +17,35 @@ class Settings:
     yolo_weights: str
     coco_names: str
     ultralytics_model: str
+    onnx_model: str
     conf_thres: float
+    input_size: int  # 0 = pick per frame from the spot layout
     video_every: int
     video_max_frames: int
+    video_max_width: int
+    video_upload_limit_mb: int
+    history_dir: str | None
+    empty_fast_path: bool
+    empty_lot_image: str | None
+    occupancy_engine: str  # detector | classifier
+    spot_classifier: str
+    camera_align: bool
+    reference_frame: str  # frame the spots were marked on
+    align_check_every: int
+    align_drift_px: float
+    bot_workers: int
+    dnn_threads: int  # per inference; 0 = cores / BOT_WORKERS in the bot, library default elsewhere
+    bot_queue_limit: int
+    user_rate_per_min: float
+    user_burst: float
+    telegram_api_url: str | None
+    webhook_url: str | None  # public base URL; set = webhook mode instead of polling
+    webhook_listen: str
+    webhook_port: int
+    webhook_path: str
+    webhook_secret: str | None
+    profile: str | None  # cprofile | sample; unset = off
+    profile_dir: str
 
 
 def load_settings() -> Settings:
@@ -32,9 +58,35 @@ def load_settings() -> Settings:
     yolo_weights = _env("YOLO_WEIGHTS", "yolov4-tiny.weights")
     coco_names = _env("COCO_NAMES", "coco.names")
     ultralytics_model = _env("ULTRALYTICS_MODEL", "yolov8n.pt")
+    onnx_model = _env("ONNX_MODEL", "/app/data/models/vehicle/vehicle.onnx")
     conf = float(_env("CONF_THRES", "0.25"))
+    input_size = _env("DETECTOR_INPUT_SIZE", "416")
     video_every = int(_env("VIDEO_EVERY", "5"))
     video_max_frames = int(_env("VIDEO_MAX_FRAMES", "180"))
+    video_max_width = int(_env("VIDEO_MAX_WIDTH", "0"))
+    video_upload_limit_mb = int(_env("VIDEO_UPLOAD_LIMIT_MB", "45"))
+    history_dir = _env("HISTORY_DIR")
+    empty_fast_path = _env("EMPTY_FAST_PATH", "0").strip().lower() in ("1", "true", "yes")
+    empty_lot_image = _env("EMPTY_LOT_IMAGE")
+    occupancy_engine = _env("OCCUPANCY_ENGINE", "detector")
+    spot_classifier = _env("SPOT_CLASSIFIER", "/app/data/models/spot_classifier.onnx")
+    camera_align = _env("CAMERA_ALIGN", "0").strip().lower() in ("1", "true", "yes")
+    reference_frame = _env("REFERENCE_FRAME", "/app/data/frame0.png")
+    align_check_every = int(_env("ALIGN_CHECK_EVERY", "25"))
+    align_drift_px = float(_env("ALIGN_DRIFT_PX", "3"))
+    bot_workers = int(_env("BOT_WORKERS", "2"))
+    bot_queue_limit = int(_env("BOT_QUEUE_LIMIT", "8"))
+    dnn_threads = int(_env("DNN_THREADS", "0"))
+    user_rate_per_min = float(_env("USER_RATE_PER_MIN", "6"))
+    user_burst = float(_env("USER_BURST", "3"))
+    telegram_api_url = _env("TELEGRAM_API_URL")
+    webhook_url = _env("WEBHOOK_URL")
+    webhook_listen = _env("WEBHOOK_LISTEN", "0.0.0.0")
+    webhook_port = int(_env("WEBHOOK_PORT", "8080"))
+    webhook_path = _env("WEBHOOK_PATH", "telegram")
+    webhook_secret = _env("WEBHOOK_SECRET")
+    profile = _env("PARKING_PROFILE")
+    profile_dir = _env("PARKING_PROFILE_DIR", "profile")
 
     return Settings(
         telegram_bot_token=token,
@@ -45,7 +97,33 @@ def load_settings() -> Settings:
         yolo_weights=yolo_weights,
         coco_names=coco_names,
         ultralytics_model=ultralytics_model,
+        onnx_model=onnx_model,
         conf_thres=conf,
+        input_size=0 if input_size.strip().lower() == "auto" else int(input_size),
         video_every=max(1, video_every),
         video_max_frames=max(0, video_max_frames),
+        video_max_width=max(0, video_max_width),
+        video_upload_limit_mb=max(1, video_upload_limit_mb),
+        history_dir=history_dir,
+        empty_fast_path=empty_fast_path,
+        empty_lot_image=empty_lot_image,
+        occupancy_engine=occupancy_engine.strip().lower(),
+        spot_classifier=spot_classifier,
+        camera_align=camera_align,
+        reference_frame=reference_frame,
+        align_check_every=max(1, align_check_every),
+        align_drift_px=max(0.0, align_drift_px),
+        bot_workers=max(1, bot_workers),
+        bot_queue_limit=max(0, bot_queue_limit),
+        dnn_threads=max(0, dnn_threads),
+        user_rate_per_min=max(0.0, user_rate_per_min),
+        user_burst=max(1.0, user_burst),
+        telegram_api_url=telegram_api_url.rstrip("/") if telegram_api_url else None,
+        webhook_url=webhook_url.rstrip("/") if webhook_url else None,
+        webhook_listen=webhook_listen,
+        webhook_port=webhook_port,
+        webhook_path=webhook_path.strip("/"),
+        webhook_secret=webhook_secret,
+        profile=profile.strip().lower() if profile and profile.strip() not in ("0", "false", "no") else None,
+        profile_dir=profile_dir,
     )
@@ -1,17 +1,95 @@
+import contextlib
+import json
+import os
+import sys
+import threading
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Iterator
 
 import cv2
 import numpy as np
 
+from .profiling import span
+from .spots import SpotIndex
 
-_VEHICLE_LABELS_CANON = {"car", "motorcycle", "bus", "truck"}
 
+VEHICLE_LABELS = {"car", "motorcycle", "bus", "truck"}
+# class names seen in custom datasets -> the canonical label
+_LABEL_ALIASES = {"motorbike": "motorcycle", "vehicle": "car", "auto": "car", "automobile": "car", "cars": "car"}
 
-def _canon_label(label: str) -> str:
-    if label == "motorbike":
-        return "motorcycle"
-    return label
+# input_size=0 picks one of these per frame from the spot layout (see `pick_input_size`)
+AUTO_INPUT_SIZE = 0
+ADAPTIVE_INPUT_SIZES = (320, 416, 512, 608)
+# smallest spot should cover at least this many network pixels (YOLOv4-tiny finest stride is 16)
+_MIN_SPOT_NET_PX = 24.0
+# detections in [conf_thres * LOW, conf_thres + HIGH) near a spot trigger a rerun at the next size
+_AMBIGUOUS_LOW = 0.5
+_AMBIGUOUS_HIGH = 0.15
+
+
+def canon_label(label: str) -> str:
+    label = label.strip().lower()
+    return _LABEL_ALIASES.get(label, label)
+
+
+class NetPool:
+    """Networks built by `factory` and lent to one thread at a time.
+
+    A `cv2.dnn.Net` (or an Ultralytics model) keeps its input and activations between `setInput` and
+    `forward`, so concurrent callers each need their own. The pool grows to the peak number of
+    concurrent callers (e.g. bot workers) and reuses those networks afterwards.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.free: list[Any] = []
+        self.size = 0
+
+    def put(self, net: Any) -> None:
+        with self.lock:
+            self.free.append(net)
+            self.size += 1
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[Any]:
+        with self.lock:
+            net = self.free.pop() if self.free else None
+            if net is None:
+                self.size += 1
+        if net is None:
+            try:
+                net = self.factory()
+            except BaseException:
+                with self.lock:
+                    self.size -= 1
+                raise
+        try:
+            yield net
+        finally:
+            with self.lock:
+                self.free.append(net)
+
+
+def set_thread_budget(threads: int) -> None:
+    """Threads each inference may use (cv2.dnn, and torch if loaded); 0 keeps the libraries' default.
+
+    With N workers running inference at once, N x threads should not exceed the cores.
+    """
+    if threads <= 0:
+        return
+    cv2.setNumThreads(int(threads))
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(int(threads))
+
+
+def thread_budget(threads: int, workers: int) -> int:
+    """`threads` if set, else an even share of the cores among `workers` concurrent inferences."""
+    if threads > 0:
+        return int(threads)
+    return max(1, (os.cpu_count() or 1) // max(1, int(workers)))
 
 
 @dataclass(frozen=True)
@@ -30,6 +108,7 @@ class VehicleDetector:
         weights_name: str = "yolov4-tiny.weights",
         coco_names_name: str = "coco.names",
         ultralytics_model: str = "yolov8n.pt",
+        onnx_model: str = "",
         conf_thres: float = 0.25,
         nms_thres: float = 0.4,
         input_size: int = 416,
@@ -39,8 +118,8 @@ class VehicleDetector:
         self.nms_thres = float(nms_thres)
         self.input_size = int(input_size)
 
-        if self.backend not in {"opencv", "ultralytics"}:
-            raise ValueError("backend must be 'opencv' or 'ultralytics'")
+        if self.backend not in {"opencv", "ultralytics", "onnx"}:
+            raise ValueError("backend must be 'opencv', 'ultralytics' or 'onnx'")
 
         if self.backend == "opencv":
             if not model_dir:
@@ -59,10 +138,34 @@ class VehicleDetector:
             self.class_names = [
                 x.strip() for x in self.names_path.read_text(encoding="utf-8").splitlines() if x.strip()
             ]
-            self.net = cv2.dnn.readNetFromDarknet(str(self.cfg_path), str(self.weights_path))
-            layer_names = self.net.getLayerNames()
-            out_layers = self.net.getUnconnectedOutLayers()
+            # files are read once; every pooled net is parsed from these buffers
+            self._model_bytes = (
+                np.frombuffer(self.cfg_path.read_bytes(), dtype=np.uint8),
+                np.frombuffer(self.weights_path.read_bytes(), dtype=np.uint8),
+            )
+            net = self._new_net()
+            layer_names = net.getLayerNames()
+            out_layers = net.getUnconnectedOutLayers()
             self.out_layer_names = [layer_names[i - 1] for i in out_layers.flatten()]
+            # one pool per input size: switching sizes on a single net reallocates every layer
+            self._pools: dict[int, NetPool] = {}
+            self._pool_for(self.input_size or ADAPTIVE_INPUT_SIZES[1]).put(net)
+        elif self.backend == "onnx":
+            # YOLOv8 ONNX export (see `parking-build-vehicle-model`) + <model>.json with names and imgsz
+            self.onnx_path = Path(onnx_model)
+            meta_path = self.onnx_path.with_suffix(".json")
+            if not self.onnx_path.exists() or not meta_path.exists():
+                raise RuntimeError(
+                    "ONNX model files not found. Build one with `parking-build-vehicle-model`. "
+                    f"Expected: {self.onnx_path}, {meta_path}"
+                )
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            self.class_names = [str(x) for x in meta["names"]]
+            # exported with a static input shape, so the size is fixed (adaptive sizing is not available)
+            self.input_size = int(meta["imgsz"])
+            self._model_bytes = (np.frombuffer(self.onnx_path.read_bytes(), dtype=np.uint8),)
+            self._pools = {}
+            self._pool_for(self.input_size).put(self._new_net())
         else:
             try:
                 from ultralytics import YOLO
@@ -72,11 +175,72 @@ class VehicleDetector:
                     "Install:\n"
                     "  uv sync --extra train\n"
                 ) from e
-            self.ultra = YOLO(ultralytics_model)
+            self._pools = {0: NetPool(lambda: YOLO(ultralytics_model))}
+            self._pools[0].put(YOLO(ultralytics_model))
 
-    def detect(self, bgr_image: np.ndarray) -> list[Detection]:
+    def detect(
+        self,
+        bgr_image: np.ndarray,
+        spot_index: SpotIndex | None = None,
+        size: int | None = None,
+        conf: float | None = None,
+    ) -> list[Detection]:
+        """Vehicles in `bgr_image`. `size` / `conf` override the configured input size and threshold for
+        this call (benchmarks); an explicit size disables adaptive sizing. ONNX models only take the
+        size they were exported with."""
+        conf = self.conf_thres if conf is None else float(conf)
+        if size is not None and self.backend == "onnx" and int(size) != self.input_size:
+            raise ValueError(f"ONNX model has a static input size of {self.input_size}, got {size}")
+        with span("detect"):
+            if size is not None:
+                return self._detect(bgr_image, int(size), conf)
+            if self.input_size == AUTO_INPUT_SIZE:
+                return self._detect_adaptive(bgr_image, spot_index, conf)
+            # ultralytics keeps the model's own imgsz unless the size is adaptive
+            size = None if self.backend == "ultralytics" else self.input_size
+            return self._detect(bgr_image, size, conf)
+
+    def _new_net(self) -> cv2.dnn.Net:
+        if self.backend == "onnx":
+            return cv2.dnn.readNetFromONNX(self._model_bytes[0])
+        return cv2.dnn.readNetFromDarknet(*self._model_bytes)
+
+    def _pool_for(self, size: int) -> NetPool:
+        if self.backend == "onnx":
+            # static input shape: a single size
+            size = self.input_size
+        pool = self._pools.get(size)
+        if pool is None:
+            pool = self._pools.setdefault(size, NetPool(self._new_net))
+        return pool
+
+    @property
+    def pooled_nets(self) -> int:
+        """Networks created so far over all input sizes (peak concurrency per size)."""
+        return sum(p.size for p in self._pools.values())
+
+    def _detect_adaptive(self, bgr_image: np.ndarray, spot_index: SpotIndex | None, conf: float) -> list[Detection]:
+        """Smallest size that resolves the spots; step up only while detections near spots are ambiguous."""
+        if spot_index is None:
+            return self._detect(bgr_image, ADAPTIVE_INPUT_SIZES[1], conf)
+
+        h, w = bgr_image.shape[:2]
+        first = pick_input_size(spot_index, (w, h))
+        low = conf * _AMBIGUOUS_LOW
+        high = conf + _AMBIGUOUS_HIGH
+        sure: list[Detection] = []
+        for size in [x for x in ADAPTIVE_INPUT_SIZES if x >= first]:
+            dets = self._detect(bgr_image, size, low)
+            sure = [d for d in dets if d.conf >= conf]
+            if not any(low <= d.conf < high and spot_index.candidates_in_box(d.xyxy) for d in dets):
+                break
+        return sure
+
+    def _detect(self, bgr_image: np.ndarray, input_size: int | None, conf_thres: float) -> list[Detection]:
         if self.backend == "ultralytics":
-            res = self.ultra.predict(bgr_image, conf=self.conf_thres, verbose=False)[0]
+            kwargs = {"imgsz": input_size} if input_size else {}
+            with span("forward"), self._pools[0].acquire() as model:
+                res = model.predict(bgr_image, conf=conf_thres, verbose=False, **kwargs)[0]
             out: list[Detection] = []
             if res.boxes is None:
                 return out
@@ -87,52 +251,60 @@ class VehicleDetector:
             names = res.names
 
             for (x1, y1, x2, y2), c, k in zip(xyxy, conf, cls):
-                label = _canon_label(names.get(int(k), str(int(k))))
-                if label not in _VEHICLE_LABELS_CANON:
+                label = canon_label(names.get(int(k), str(int(k))))
+                if label not in VEHICLE_LABELS:
                     continue
                 out.append(Detection(xyxy=(float(x1), float(y1), float(x2), float(y2)), conf=float(c), label=label))
             return out
 
         h, w = bgr_image.shape[:2]
-        blob = cv2.dnn.blobFromImage(
-            bgr_image,
-            1 / 255.0,
-            (self.input_size, self.input_size),
-            (0, 0, 0),
-            swapRB=True,
-            crop=False,
-        )
-        self.net.setInput(blob)
-        outs = self.net.forward(self.out_layer_names)
-
-        boxes_xywh: list[list[int]] = []
-        confidences: list[float] = []
-        class_ids: list[int] = []
-
-        for out in outs:
-            for det in out:
-                scores = det[5:]
-                class_id = int(np.argmax(scores))
-                conf = float(scores[class_id])
-                if conf < self.conf_thres:
-                    continue
-                raw_label = self.class_names[class_id] if 0 <= class_id < len(self.class_names) else str(class_id)
-                label = _canon_label(raw_label)
-                if label not in _VEHICLE_LABELS_CANON:
-                    continue
+        with span("preprocess"):
+            blob = cv2.dnn.blobFromImage(
+                bgr_image,
+                1 / 255.0,
+                (input_size, input_size),
+                (0, 0, 0),
+                swapRB=True,
+                crop=False,
+            )
+        if self.backend == "onnx":
+            with span("forward"), self._pool_for(input_size).acquire() as net:
+                net.setInput(blob)
+                raw = net.forward()
+            boxes_xywh, confidences, class_ids = self._parse_onnx(raw, w, h, input_size, conf_thres)
+        else:
+            with span("forward"), self._pool_for(input_size).acquire() as net:
+                net.setInput(blob)
+                outs = net.forward(self.out_layer_names)
+            boxes_xywh: list[list[int]] = []
+            confidences: list[float] = []
+            class_ids: list[int] = []
+
+            for out in outs:
+                for det in out:
+                    scores = det[5:]
+                    class_id = int(np.argmax(scores))
+                    conf = float(scores[class_id])
+                    if conf < conf_thres:
+                        continue
+                    n_names = len(self.class_names)
+                    raw_label = self.class_names[class_id] if 0 <= class_id < n_names else str(class_id)
+                    label = canon_label(raw_label)
+                    if label not in VEHICLE_LABELS:
+                        continue
 
-                cx = int(det[0] * w)
-                cy = int(det[1] * h)
-                bw = int(det[2] * w)
-                bh = int(det[3] * h)
-                x = int(cx - bw / 2)
-                y = int(cy - bh / 2)
+                    cx = int(det[0] * w)
+                    cy = int(det[1] * h)
+                    bw = int(det[2] * w)
+                    bh = int(det[3] * h)
+                    x = int(cx - bw / 2)
+                    y = int(cy - bh / 2)
 
-                boxes_xywh.append([x, y, bw, bh])
-                confidences.append(conf)
-                class_ids.append(class_id)
+                    boxes_xywh.append([x, y, bw, bh])
+                    confidences.append(conf)
+                    class_ids.append(class_id)
 
-        idxs = cv2.dnn.NMSBoxes(boxes_xywh, confidences, self.conf_thres, self.nms_thres)
+        idxs = cv2.dnn.NMSBoxes(boxes_xywh, confidences, conf_thres, self.nms_thres)
         out: list[Detection] = []
         if len(idxs) == 0:
             return out
@@ -147,11 +319,32 @@ class VehicleDetector:
                 Detection(
                     xyxy=(float(x1), float(y1), float(x2), float(y2)),
                     conf=float(confidences[i]),
-                    label=_canon_label(raw_label),
+                    label=canon_label(raw_label),
                 )
             )
         return out
 
+    def _parse_onnx(
+        self, out: np.ndarray, w: int, h: int, input_size: int, conf_thres: float
+    ) -> tuple[list[list[int]], list[float], list[int]]:
+        # YOLOv8 head: (1, 4 + nc, anchors), boxes are cx, cy, w, h in network pixels, no objectness
+        pred = out.reshape(out.shape[-2], out.shape[-1]).T
+        scores = pred[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confs = scores[np.arange(len(pred)), class_ids]
+        vehicle_ids = [i for i, n in enumerate(self.class_names) if canon_label(n) in VEHICLE_LABELS]
+        keep = (confs >= conf_thres) & np.isin(class_ids, vehicle_ids)
+        pred, confs, class_ids = pred[keep], confs[keep], class_ids[keep]
+
+        sx = w / input_size
+        sy = h / input_size
+        bw = pred[:, 2] * sx
+        bh = pred[:, 3] * sy
+        x = pred[:, 0] * sx - bw / 2
+        y = pred[:, 1] * sy - bh / 2
+        boxes = np.stack((x, y, bw, bh), axis=1).astype(int).tolist()
+        return boxes, confs.astype(float).tolist(), class_ids.astype(int).tolist()
+
 
 def centers_from_detections(dets: list[Detection]) -> np.ndarray:
     if not dets:
@@ -161,3 +354,23 @@ def centers_from_detections(dets: list[Detection]) -> np.ndarray:
         x1, y1, x2, y2 = d.xyxy
         centers.append(((x1 + x2) / 2.0, (y1 + y2) / 2.0))
     return np.array(centers, dtype=np.float32)
+
+
+def pick_input_size(
+    spot_index: SpotIndex,
+    frame_size: tuple[int, int],
+    sizes: tuple[int, ...] = ADAPTIVE_INPUT_SIZES,
+) -> int:
+    """Smallest network size at which the smallest spot still spans `_MIN_SPOT_NET_PX` pixels."""
+    if not spot_index.spots:
+        return sizes[len(sizes) // 2]
+    w, h = frame_size
+    b = spot_index.bboxes
+    # blobFromImage stretches to size x size, so x and y scale independently
+    need_x = _MIN_SPOT_NET_PX * w / max(1.0, float((b[:, 2] - b[:, 0]).min()))
+    need_y = _MIN_SPOT_NET_PX * h / max(1.0, float((b[:, 3] - b[:, 1]).min()))
+    need = max(need_x, need_y)
+    for size in sizes:
+        if size >= need:
+            return size
+    return sizes[-1]
@@ -0,0 +1,200 @@
+import calendar
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+import numpy as np
+
+# Layout on disk:
+#   <root>/layout_<sig>/meta.json          spot ids (bit order) for this layout
+#   <root>/layout_<sig>/YYYYMMDD.bin       fixed-width records, one UTC day per chunk
+# Record = int64 timestamp (ms, UTC) + occupancy bits packed with np.packbits (1 = occupied).
+# Chunks stay sorted by timestamp (late records are merged into the tail on flush) and are read
+# back with np.memmap, so scans never parse text. Several processes (bot replicas, demo-video
+# --history) may share a layout dir: writes hold an flock on <layout dir>/.lock.
+
+_DAY_MS = 86_400_000
+_HOUR_MS = 3_600_000
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def layout_signature(spot_ids: list[str]) -> str:
+    return hashlib.sha1("\n".join(spot_ids).encode("utf-8")).hexdigest()[:12]
+
+
+class OccupancyStore:
+    def __init__(self, root: str | Path, spot_ids: list[str], flush_every: int = 256):
+        self.spot_ids = list(spot_ids)
+        self.dir = Path(root) / f"layout_{layout_signature(self.spot_ids)}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta = self.dir / "meta.json"
+        if not meta.exists():
+            meta.write_text(json.dumps({"spot_ids": self.spot_ids}, ensure_ascii=False), encoding="utf-8")
+
+        self.nbytes = max(1, (len(self.spot_ids) + 7) // 8)
+        self.dtype = np.dtype([("ts", "<i8"), ("bits", "u1", (self.nbytes,))])
+        self.flush_every = max(1, int(flush_every))
+        self._pos = {sid: i for i, sid in enumerate(self.spot_ids)}
+        # bot workers append concurrently (a photo and several videos at once), each with its own
+        # clock; records are buffered and merged into the chunks in time order on flush
+        self._lock = threading.Lock()
+        self._pending: list[tuple[int, np.ndarray]] = []
+
+    def __enter__(self) -> "OccupancyStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _chunk_path(self, day: int) -> Path:
+        return self.dir / (time.strftime("%Y%m%d", time.gmtime(day * _DAY_MS / 1000)) + ".bin")
+
+    def append(self, ts: float, occupied: dict[str, bool]) -> None:
+        """Record one frame's occupancy at unix time `ts` (seconds); appends need not be in time order."""
+        flags = np.zeros(len(self.spot_ids), dtype=bool)
+        for sid, occ in occupied.items():
+            i = self._pos.get(sid)
+            if i is not None:
+                flags[i] = bool(occ)
+        bits = np.packbits(flags, bitorder="little")[: self.nbytes] if len(flags) else np.zeros(self.nbytes, np.uint8)
+
+        with self._lock:
+            self._pending.append((int(round(ts * 1000)), bits))
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        recs = np.zeros(len(self._pending), dtype=self.dtype)
+        recs["ts"] = [t for t, _ in self._pending]
+        recs["bits"] = np.stack([b for _, b in self._pending])
+        self._pending = []
+        recs = recs[np.argsort(recs["ts"], kind="stable")]
+        days = recs["ts"] // _DAY_MS
+        for day in np.unique(days):
+            self._merge(int(day), recs[days == day])
+
+    @contextlib.contextmanager
+    def _dir_lock(self) -> Iterator[None]:
+        """Exclusive lock on the layout dir across processes (threads are serialised by `_lock`)."""
+        with open(self.dir / ".lock", "a+b") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def _whole_records(self, path: Path) -> int:
+        """Records in `path`; a torn record left by a killed writer is cut off first (hold `_dir_lock`)."""
+        if not path.exists():
+            return 0
+        size = path.stat().st_size
+        n, extra = divmod(size, self.dtype.itemsize)
+        if extra:
+            # otherwise every later append would land misaligned
+            os.truncate(path, n * self.dtype.itemsize)
+        return n
+
+    def _merge(self, day: int, recs: np.ndarray) -> None:
+        """Write time-sorted `recs` into the day's chunk, keeping the chunk sorted for `searchsorted`."""
+        path = self._chunk_path(day)
+        with self._dir_lock():
+            n = self._whole_records(path)
+            pos = n
+            if n:
+                on_disk = np.memmap(path, dtype=self.dtype, mode="r", shape=(n,))
+                pos = int(np.searchsorted(on_disk["ts"], recs["ts"][0], side="right"))
+                if pos < n:
+                    # late records (another source's clock): rewrite only the overlapping tail
+                    tail = np.array(on_disk[pos:])
+                    recs = np.concatenate((tail, recs))
+                    recs = recs[np.argsort(recs["ts"], kind="stable")]
+                del on_disk
+            if pos == n:
+                with open(path, "ab") as fh:
+                    fh.write(recs.tobytes())
+            else:
+                with open(path, "r+b") as fh:
+                    fh.seek(pos * self.dtype.itemsize)
+                    fh.write(recs.tobytes())
+
+    def close(self) -> None:
+        self.flush()
+
+    def _blocks(self, start: float | None, end: float | None, block_rows: int = 65_536):
+        """Time-ordered record slices in [start, end), at most `block_rows` each, memory-mapped."""
+        self.flush()
+        lo = None if start is None else int(start * 1000)
+        hi = None if end is None else int(end * 1000)
+        for path in sorted(self.dir.glob("*.bin")):
+            day_ms = calendar.timegm(time.strptime(path.stem, "%Y%m%d")) * 1000
+            if (hi is not None and day_ms >= hi) or (lo is not None and day_ms + _DAY_MS <= lo):
+                continue
+            with self._dir_lock():
+                n = self._whole_records(path)
+                if n == 0:
+                    continue
+                recs = np.memmap(path, dtype=self.dtype, mode="r", shape=(n,))
+            a = 0 if lo is None else int(np.searchsorted(recs["ts"], lo, side="left"))
+            b = n if hi is None else int(np.searchsorted(recs["ts"], hi, side="left"))
+            for i in range(a, b, block_rows):
+                yield recs[i : min(b, i + block_rows)]
+
+    def free_counts(self, start: float | None = None, end: float | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(timestamps in seconds, free spot count) for every record in [start, end)."""
+        ts_parts: list[np.ndarray] = []
+        free_parts: list[np.ndarray] = []
+        total = len(self.spot_ids)
+        for recs in self._blocks(start, end):
+            ts_parts.append(recs["ts"] / 1000.0)
+            free_parts.append(total - _POPCOUNT[recs["bits"]].sum(axis=1).astype(np.int32))
+        if not ts_parts:
+            return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int32)
+        return np.concatenate(ts_parts), np.concatenate(free_parts)
+
+    def hourly_utilisation(
+        self, start: float | None = None, end: float | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(hour starts in seconds, [hours x spots] fraction of samples each spot was occupied)."""
+        n_spots = len(self.spot_ids)
+        hours_parts: list[np.ndarray] = []
+        sums_parts: list[np.ndarray] = []
+        counts_parts: list[np.ndarray] = []
+        for recs in self._blocks(start, end):
+            hours = recs["ts"] // _HOUR_MS
+            # records are time-ordered, so each hour is one contiguous run
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(hours)) + 1))
+            bits = np.unpackbits(np.asarray(recs["bits"]), axis=1, bitorder="little")[:, :n_spots]
+            sums = np.add.reduceat(bits.astype(np.uint32), starts, axis=0)
+            counts = np.diff(np.concatenate((starts, [len(hours)])))
+            hours = hours[starts]
+            if hours_parts and hours_parts[-1][-1] == hours[0]:
+                # an hour split across two blocks
+                sums_parts[-1][-1] += sums[0]
+                counts_parts[-1][-1] += counts[0]
+                hours, sums, counts = hours[1:], sums[1:], counts[1:]
+            if len(hours):
+                hours_parts.append(hours)
+                sums_parts.append(sums)
+                counts_parts.append(counts)
+        if not hours_parts:
+            return np.zeros(0, dtype=np.float64), np.zeros((0, n_spots), dtype=np.float64)
+        counts = np.concatenate(counts_parts)
+        return np.concatenate(hours_parts) * 3600.0, np.concatenate(sums_parts) / counts[:, None]
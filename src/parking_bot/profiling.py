@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+# Off unless `start` is called: `span` then returns one shared no-op context manager, so the
+# instrumented stages cost a global lookup and a function call.
+
+MODES = ("cprofile", "sample")
+
+_NULL = contextlib.nullcontext()
+_state: "_Session | None" = None
+
+
+class _Span:
+    __slots__ = ("session", "name", "t0", "child")
+
+    def __init__(self, session: "_Session", name: str):
+        self.session = session
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.session.stack().append(self)
+        self.child = 0.0
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        dt = time.perf_counter() - self.t0
+        stack = self.session.stack()
+        path = ";".join(s.name for s in stack)
+        stack.pop()
+        if stack:
+            stack[-1].child += dt
+        self.session.record(path, dt, dt - self.child)
+
+
+class _Session:
+    def __init__(self, mode: str, out_dir: Path, interval_s: float):
+        self.mode = mode
+        self.out_dir = out_dir
+        self.interval_s = interval_s
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # span path -> [count, total s, self s, max s]
+        self.spans: dict[str, list[float]] = {}
+        self.profiles: list[cProfile.Profile] = []
+        self.samples: Counter[str] = Counter()
+        self.t0 = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def stack(self) -> list[_Span]:
+        st = getattr(self.local, "stack", None)
+        if st is None:
+            st = self.local.stack = []
+        return st
+
+    def record(self, path: str, total: float, own: float) -> None:
+        with self.lock:
+            agg = self.spans.get(path)
+            if agg is None:
+                self.spans[path] = [1, total, own, total]
+            else:
+                agg[0] += 1
+                agg[1] += total
+                agg[2] += own
+                agg[3] = max(agg[3], total)
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                funcs = []
+                while frame is not None:
+                    co = frame.f_code
+                    funcs.append(f"{co.co_name} ({Path(co.co_filename).name}:{co.co_firstlineno})")
+                    frame = frame.f_back
+                funcs.append(names.get(tid, str(tid)))
+                self.samples[";".join(reversed(funcs))] += 1
+
+    def begin(self) -> None:
+        if self.mode == "cprofile":
+            prof = cProfile.Profile()
+            prof.enable()
+            self.profiles.append(prof)
+        else:
+            self._sampler = threading.Thread(target=self._sample, name="parking-profiler", daemon=True)
+            self._sampler.start()
+
+    def end(self) -> list[Path]:
+        wall = time.perf_counter() - self.t0
+        if self.mode == "cprofile":
+            self.profiles[0].disable()
+        elif self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        # pid: replicas sharing PARKING_PROFILE_DIR (or back-to-back runs) must not overwrite each other
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        written = []
+
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda kv: kv[0])
+        table = _stage_table(spans, wall)
+        path = self.out_dir / f"{stamp}-stages.txt"
+        path.write_text(table, encoding="utf-8")
+        written.append(path)
+        print(table, file=sys.stderr)
+
+        # span self time in microseconds: a flamegraph of the pipeline stages themselves
+        path = self.out_dir / f"{stamp}-stages.collapsed"
+        path.write_text("".join(f"{p} {int(a[2] * 1e6)}\n" for p, a in spans if a[2] > 0), encoding="utf-8")
+        written.append(path)
+
+        if self.mode == "cprofile":
+            stats = pstats.Stats(self.profiles[0])
+            for prof in self.profiles[1:]:
+                stats.add(prof)
+            path = self.out_dir / f"{stamp}.prof"
+            stats.dump_stats(path)
+            written.append(path)
+            buf = io.StringIO()
+            pstats.Stats(str(path), stream=buf).sort_stats("cumulative").print_stats(40)
+            path = self.out_dir / f"{stamp}-cprofile.txt"
+            path.write_text(buf.getvalue(), encoding="utf-8")
+            written.append(path)
+        else:
+            path = self.out_dir / f"{stamp}-samples.collapsed"
+            path.write_text("".join(f"{k} {v}\n" for k, v in self.samples.most_common()), encoding="utf-8")
+            written.append(path)
+        return written
+
+
+def _stage_table(spans: list[tuple[str, list[float]]], wall: float) -> str:
+    lines = [
+        f"Stages over {wall:.2f}s wall",
+        f"{'stage':<40} {'calls':>7} {'total s':>9} {'self s':>9} {'mean ms':>9} {'max ms':>9} {'% wall':>7}",
+    ]
+    for path, (n, total, own, mx) in spans:
+        depth = path.count(";")
+        name = "  " * depth + path.rsplit(";", 1)[-1]
+        lines.append(
+            f"{name:<40} {int(n):>7} {total:>9.3f} {own:>9.3f} {total / n * 1e3:>9.2f} {mx * 1e3:>9.2f} "
+            f"{total / wall * 100 if wall > 0 else 0:>6.1f}%"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def enabled() -> bool:
+    return _state is not None
+
+
+def span(name: str):
+    """Time a pipeline stage; spans nest per thread (`video;frame;detect`)."""
+    s = _state
+    if s is None:
+        return _NULL
+    return _Span(s, name)
+
+
+def iter_span(name: str, it: Iterable) -> Iterator:
+    """Yield from `it`, timing each step (e.g. decoding inside a frame iterator) as span `name`."""
+    if _state is None:
+        yield from it
+        return
+    it = iter(it)
+    while True:
+        with span(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def in_thread(fn: Callable[..., Any], *args) -> Any:
+    """Run `fn(*args)` on a worker thread so cProfile sees it too (it only profiles the enabling thread)."""
+    s = _state
+    if s is None or s.mode != "cprofile":
+        return fn(*args)
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # Python 3.12+: the profiler started in `start` already covers every thread
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        prof.disable()
+        with s.lock:
+            s.profiles.append(prof)
+
+
+def start(mode: str | None, out_dir: str | Path = "profile", interval_s: float = 0.005) -> None:
+    global _state
+    if not mode or _state is not None:
+        return
+    mode = mode.strip().lower()
+    if mode in ("1", "true", "yes"):
+        mode = "cprofile"
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(MODES)})")
+    session = _Session(mode, Path(out_dir), interval_s)
+    session.begin()
+    _state = session
+
+
+def stop() -> list[Path]:
+    """Stop profiling and write the stage table, collapsed stacks and profiler output; [] if it was off."""
+    global _state
+    s, _state = _state, None
+    if s is None:
+        return []
+    written = s.end()
+    print("Profile written: " + ", ".join(str(p) for p in written), file=sys.stderr)
+    return written
+
+
+@contextlib.contextmanager
+def session(mode: str | None, out_dir: str | Path = "profile") -> Iterator[None]:
+    """Profile the enclosed block when `mode` is set (cprofile | sample); a no-op otherwise."""
+    start(mode, out_dir)
+    try:
+        yield
+    finally:
+        stop()
+
+
+def add_argument(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        default="",
+        choices=("",) + MODES,
+        help="Profile the run: cprofile (default) or sample; output goes to PARKING_PROFILE_DIR",
+    )
@@ -0,0 +1,160 @@
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .profiling import span
+
+# frames are registered at this size at most; ORB cost grows with the pixel count
+_REGISTER_SIDE = 800
+# drift is checked on thumbnails this wide
+_THUMB_W = 160
+
+
+def _gray(bgr: np.ndarray, max_side: int) -> tuple[np.ndarray, float]:
+    gray = bgr if bgr.ndim == 2 else cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+def _thumb(bgr: np.ndarray) -> np.ndarray:
+    gray = bgr if bgr.ndim == 2 else cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    th = max(8, round(h * _THUMB_W / w))
+    return cv2.resize(gray, (_THUMB_W, th), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class CameraRegistration:
+    """ORB features of the reference frame (the one spots were marked on) and a RANSAC homography
+    from it to any later frame of the same camera, at any resolution."""
+
+    def __init__(self, reference_bgr: np.ndarray, n_features: int = 1500, min_inliers: int = 30, ransac_px: float = 3.0):
+        self.reference_size = (int(reference_bgr.shape[1]), int(reference_bgr.shape[0]))
+        self.min_inliers = int(min_inliers)
+        self.ransac_px = float(ransac_px)
+        self.orb = cv2.ORB_create(nfeatures=int(n_features))
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        gray, scale = _gray(reference_bgr, _REGISTER_SIDE)
+        kp, self.ref_des = self.orb.detectAndCompute(gray, None)
+        self.ref_pts = np.float32([k.pt for k in kp]) / scale if kp else np.zeros((0, 2), np.float32)
+
+    def estimate(self, bgr: np.ndarray) -> tuple[np.ndarray | None, int]:
+        """(reference -> frame homography or None if registration failed, RANSAC inliers)."""
+        if self.ref_des is None or len(self.ref_pts) < self.min_inliers:
+            return None, 0
+        gray, scale = _gray(bgr, _REGISTER_SIDE)
+        kp, des = self.orb.detectAndCompute(gray, None)
+        if des is None or len(kp) < self.min_inliers:
+            return None, 0
+        pairs = self.matcher.knnMatch(self.ref_des, des, k=2)
+        # Lowe's ratio test
+        good = [m[0] for m in pairs if len(m) == 2 and m[0].distance < 0.75 * m[1].distance]
+        if len(good) < self.min_inliers:
+            return None, len(good)
+        src = self.ref_pts[[m.queryIdx for m in good]].reshape(-1, 1, 2)
+        dst = (np.float32([kp[m.trainIdx].pt for m in good]) / scale).reshape(-1, 1, 2)
+        H, mask = cv2.findHomography(src, dst, cv2.RANSAC, self.ransac_px)
+        inliers = int(mask.sum()) if mask is not None else 0
+        if H is None or inliers < self.min_inliers or not self._plausible(H, (bgr.shape[1], bgr.shape[0])):
+            return None, inliers
+        return H, inliers
+
+    def _plausible(self, H: np.ndarray, frame_size: tuple[int, int]) -> bool:
+        # a slightly moved camera: the reference outline stays convex and keeps roughly its area
+        w, h = self.reference_size
+        corners = np.float64([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+        quad = cv2.perspectiveTransform(corners, H).reshape(-1, 2).astype(np.float32)
+        if not cv2.isContourConvex(quad):
+            return False
+        expected = frame_size[0] * frame_size[1]
+        return 0.5 < abs(cv2.contourArea(quad)) / expected < 2.0
+
+
+class CameraAligner:
+    """Keeps spot polygons on the right pixels when the camera is nudged.
+
+    Registration (ORB + RANSAC) is the expensive part, so it runs on the first frame, then every
+    `register_every` frames, or sooner when a cheap check finds drift: every `check_every` frames a
+    thumbnail is phase-correlated with the one from the last registration, and a shift above
+    `drift_px` (frame pixels) triggers a new registration. Between those, `homography` returns the
+    cached matrix, so `SpotLayout.scaled` keeps its cached polygons and index.
+    """
+
+    def __init__(
+        self,
+        reference_bgr: np.ndarray,
+        check_every: int = 25,
+        register_every: int = 1000,
+        drift_px: float = 3.0,
+    ):
+        self.registration = CameraRegistration(reference_bgr)
+        self.check_every = max(1, int(check_every))
+        self.register_every = max(self.check_every, int(register_every))
+        self.drift_px = float(drift_px)
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.registrations = 0
+        self.failures = 0
+        self.last_drift = 0.0
+        self._since = 0
+        self._thumb: np.ndarray | None = None
+        # reference -> frame in frame-size units, so the same camera at another resolution needs no new registration
+        self._H: np.ndarray | None = None
+        self._cache: dict[tuple, np.ndarray] = {}
+
+    def _drift(self, bgr: np.ndarray) -> float:
+        thumb = _thumb(bgr)
+        if self._thumb is None or thumb.shape != self._thumb.shape:
+            return float("inf")
+        with span("drift"):
+            (dx, dy), _ = cv2.phaseCorrelate(self._thumb, thumb)
+        return float(np.hypot(dx, dy)) * bgr.shape[1] / _THUMB_W
+
+    def _register(self, bgr: np.ndarray) -> None:
+        with span("register"):
+            H, _ = self.registration.estimate(bgr)
+        self.registrations += 1
+        self._since = 0
+        if H is None:
+            # keep the previous alignment rather than snapping back to plain scaling, and keep the old
+            # drift baseline too: the next check still sees the shift and tries again
+            self.failures += 1
+            return
+        self._thumb = _thumb(bgr)
+        self._H = np.diag([1.0 / bgr.shape[1], 1.0 / bgr.shape[0], 1.0]) @ H
+        self._cache = {}
+
+    def homography(self, bgr: np.ndarray, image_size: tuple[int, int] | None) -> np.ndarray | None:
+        """Spot config coordinates (marked at `image_size`, default: reference size) -> `bgr` pixels.
+
+        None until a registration succeeds; the same array is returned until the next registration.
+        """
+        with self.lock:
+            self.frames += 1
+            self._since += 1
+            if self.registrations == 0 or self._since >= self.register_every:
+                self._register(bgr)
+            elif self._since % self.check_every == 0:
+                self.last_drift = self._drift(bgr)
+                if self.last_drift > self.drift_px:
+                    self._register(bgr)
+            if self._H is None:
+                return None
+            src = image_size or self.registration.reference_size
+            size = (int(bgr.shape[1]), int(bgr.shape[0]))
+            H = self._cache.get((src, size))
+            if H is None:
+                rw, rh = self.registration.reference_size
+                to_ref = np.diag([rw / src[0], rh / src[1], 1.0])
+                H = self._cache[(src, size)] = np.diag([size[0], size[1], 1.0]) @ self._H @ to_ref
+            return H
+
+
+def new_aligner(reference_path: str | Path, **kwargs) -> CameraAligner:
+    ref = cv2.imread(str(reference_path))
+    if ref is None:
+        raise FileNotFoundError(f"Cannot read reference frame: {reference_path}")
+    return CameraAligner(ref, **kwargs)
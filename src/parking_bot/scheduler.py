@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from . import profiling
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`; a request spends `cost` tokens or is refused."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def take(self, cost: float = 1.0, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def wait_s(self, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens are available."""
+        return max(0.0, (cost - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+class RateLimiter:
+    """One token bucket per user, created on first use.
+
+    A bucket that has refilled to `burst` behaves exactly like a new one, so such buckets are dropped
+    by a sweep every refill period: the dict holds only recently active users.
+    """
+
+    def __init__(self, rate_per_min: float, burst: float):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.buckets: dict[int, TokenBucket] = {}
+        self._sweep_at = time.monotonic()
+
+    def _sweep(self, now: float) -> None:
+        full = [uid for uid, b in self.buckets.items() if b.tokens + (now - b.stamp) * self.rate >= self.burst]
+        for uid in full:
+            del self.buckets[uid]
+        # any bucket idle for this long has refilled completely
+        self._sweep_at = now + self.burst / self.rate
+
+    def take(self, user_id: int, cost: float = 1.0) -> tuple[bool, float]:
+        """(allowed, seconds to wait if not)."""
+        if self.rate <= 0:
+            return True, 0.0
+        now = time.monotonic()
+        if now >= self._sweep_at:
+            self._sweep(now)
+        b = self.buckets.get(user_id)
+        if b is None:
+            b = self.buckets[user_id] = TokenBucket(self.rate, self.burst)
+        if b.take(cost):
+            return True, 0.0
+        return False, b.wait_s(cost)
+
+
+class QueueFull(RuntimeError):
+    def __init__(self, lane: str, waiting: int):
+        super().__init__(f"{lane} queue is full ({waiting} waiting)")
+        self.lane = lane
+        self.waiting = waiting
+
+
+class _Job:
+    # compared by identity: args may hold numpy arrays, which do not support ==
+    __slots__ = ("fn", "args", "fut")
+
+    def __init__(self, fn: Callable, args: tuple, fut: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.fut = fut
+
+
+class Scheduler:
+    """Priority lanes in front of a fixed number of worker threads.
+
+    Lanes are served in the given order (earlier = higher priority). Every lane but the first may use
+    at most `workers - reserved` workers (but at least one), so with two or more workers a long job
+    from a low lane never takes the last worker from the first one: photo latency stays bounded while
+    videos pile up. With a single worker nothing can be reserved: lanes share it, and a waiting photo
+    only goes first once the running job finishes. Each lane holds at most `queue_limit` waiting jobs.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, lanes: tuple[str, ...] = ("photo", "video"), reserved: int = 1):
+        self.workers = max(1, int(workers))
+        self.queue_limit = max(0, int(queue_limit))
+        self.lanes = lanes
+        self.limits = {lane: self.workers for lane in lanes}
+        for lane in lanes[1:]:
+            self.limits[lane] = max(1, self.workers - max(0, int(reserved)))
+        self.queues: dict[str, deque] = {lane: deque() for lane in lanes}
+        self.running: dict[str, int] = {lane: 0 for lane in lanes}
+
+    def full(self, lane: str) -> bool:
+        return len(self.queues[lane]) >= self.queue_limit and not self._can_start(lane)
+
+    def backlog(self, lane: str) -> int:
+        """Jobs of `lane` waiting for a worker."""
+        return len(self.queues[lane])
+
+    def _can_start(self, lane: str) -> bool:
+        return sum(self.running.values()) < self.workers and self.running[lane] < self.limits[lane]
+
+    def _position(self, lane: str, job) -> int:
+        ahead = sum(len(self.queues[lo]) for lo in self.lanes[: self.lanes.index(lane)])
+        return ahead + self.queues[lane].index(job) + 1
+
+    def _dispatch(self) -> None:
+        started = True
+        while started:
+            started = False
+            for lane in self.lanes:
+                if self.queues[lane] and self._can_start(lane):
+                    job = self.queues[lane].popleft()
+                    self.running[lane] += 1
+                    asyncio.get_running_loop().create_task(self._exec(lane, job))
+                    started = True
+                    break
+
+    async def _exec(self, lane: str, job: _Job) -> None:
+        fut = job.fut
+        try:
+            if not fut.cancelled():
+                res = await asyncio.to_thread(profiling.in_thread, job.fn, *job.args)
+                if not fut.cancelled():
+                    fut.set_result(res)
+        except Exception as e:
+            if not fut.cancelled():
+                fut.set_exception(e)
+        finally:
+            self.running[lane] -= 1
+            self._dispatch()
+
+    async def run(
+        self,
+        lane: str,
+        fn: Callable[..., Any],
+        *args,
+        on_queued: Callable[[int], Awaitable[None]] | None = None,
+    ) -> Any:
+        """Run blocking `fn(*args)` on a worker thread; `on_queued(position)` is awaited if it has to wait.
+
+        Raises `QueueFull` when the lane's queue is at its limit.
+        """
+        if self.full(lane):
+            raise QueueFull(lane, len(self.queues[lane]))
+        fut = asyncio.get_running_loop().create_future()
+        job = _Job(fn, args, fut)
+        self.queues[lane].append(job)
+        self._dispatch()
+        if on_queued is not None and job in self.queues[lane]:
+            await on_queued(self._position(lane, job))
+        try:
+            return await fut
+        finally:
+            if job in self.queues[lane]:
+                self.queues[lane].remove(job)
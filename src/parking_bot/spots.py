@@ -1,8 +1,12 @@
 import json
+import os
+import tempfile
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable
 
+import cv2
 import numpy as np
 
 
@@ -33,6 +37,22 @@ def load_spots(path: str | Path) -> SpotsConfig:
     return SpotsConfig(image_size=image_size, spots=spots)
 
 
+def save_spots(path: str | Path, spots: list[Spot], image_size: tuple[int, int] | None) -> None:
+    """Write in the `load_spots` format, one spot per line, atomically (temp file + rename)."""
+    p = Path(path)
+    lines = [json.dumps({"id": s.spot_id, "polygon": [list(pt) for pt in s.polygon]}, ensure_ascii=False) for s in spots]
+    size = json.dumps(list(image_size) if image_size is not None else None)
+    text = '{"image_size": ' + size + ', "spots": [\n' + ",\n".join(lines) + "\n]}\n"
+    # a unique temp file in the same directory, so concurrent writers never replace each other's file
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=p.parent, prefix=p.name + ".", suffix=".tmp", delete=False) as f:
+        f.write(text)
+    try:
+        os.replace(f.name, p)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
 def scale_spots(spots_cfg: SpotsConfig, target_size: tuple[int, int]) -> list[Spot]:
     if spots_cfg.image_size is None:
         return spots_cfg.spots
@@ -52,6 +72,19 @@ def scale_spots(spots_cfg: SpotsConfig, target_size: tuple[int, int]) -> list[Sp
     return scaled
 
 
+def warp_spots(spots: list[Spot], homography: np.ndarray) -> list[Spot]:
+    """Apply a 3x3 homography to every polygon point with a single `cv2.perspectiveTransform` call."""
+    if not spots:
+        return []
+    lengths = [len(s.polygon) for s in spots]
+    pts = np.asarray([pt for s in spots for pt in s.polygon], dtype=np.float64).reshape(-1, 1, 2)
+    warped = np.rint(cv2.perspectiveTransform(pts, np.asarray(homography, dtype=np.float64))).astype(int)
+    out = []
+    for s, poly in zip(spots, np.split(warped.reshape(-1, 2), np.cumsum(lengths)[:-1])):
+        out.append(Spot(spot_id=s.spot_id, polygon=[(x, y) for x, y in poly.tolist()]))
+    return out
+
+
 def point_in_polygon(point: tuple[float, float], polygon: Iterable[tuple[int, int]]) -> bool:
     """Ray casting algorithm."""
     x, y = point
@@ -78,3 +111,116 @@ def spot_occupied(spot: Spot, vehicle_centers: np.ndarray) -> bool:
         if point_in_polygon((float(cx), float(cy)), spot.polygon):
             return True
     return False
+
+
+class SpotIndex:
+    """Uniform grid over spot bounding boxes: narrows a point/box to a few candidate spots."""
+
+    def __init__(self, spots: list[Spot], cell_size: int | None = None):
+        self.spots = spots
+        n = len(spots)
+        self.bboxes = np.zeros((n, 4), dtype=np.float32)  # x1, y1, x2, y2
+        for i, s in enumerate(spots):
+            pts = np.asarray(s.polygon, dtype=np.float32).reshape(-1, 2)
+            if len(pts):
+                self.bboxes[i] = (pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max())
+
+        if cell_size is None:
+            # median spot extent keeps each spot in ~1-4 cells
+            if n:
+                extents = np.maximum(self.bboxes[:, 2] - self.bboxes[:, 0], self.bboxes[:, 3] - self.bboxes[:, 1])
+                cell_size = int(np.median(extents))
+            else:
+                cell_size = 64
+        self.cell_size = max(1, int(cell_size))
+
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        c = self.cell_size
+        for i, (x1, y1, x2, y2) in enumerate(self.bboxes.tolist()):
+            for gx in range(int(x1 // c), int(x2 // c) + 1):
+                for gy in range(int(y1 // c), int(y2 // c) + 1):
+                    self.cells.setdefault((gx, gy), []).append(i)
+
+    def candidates_at(self, x: float, y: float) -> list[int]:
+        c = self.cell_size
+        out = []
+        for i in self.cells.get((int(x // c), int(y // c)), ()):
+            x1, y1, x2, y2 = self.bboxes[i]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                out.append(i)
+        return out
+
+    def candidates_in_box(self, xyxy: tuple[float, float, float, float]) -> list[int]:
+        bx1, by1, bx2, by2 = xyxy
+        c = self.cell_size
+        seen: set[int] = set()
+        for gx in range(int(bx1 // c), int(bx2 // c) + 1):
+            for gy in range(int(by1 // c), int(by2 // c) + 1):
+                seen.update(self.cells.get((gx, gy), ()))
+        out = []
+        for i in sorted(seen):
+            x1, y1, x2, y2 = self.bboxes[i]
+            if x1 <= bx2 and bx1 <= x2 and y1 <= by2 and by1 <= y2:
+                out.append(i)
+        return out
+
+    def spots_at(self, x: float, y: float) -> list[Spot]:
+        return [self.spots[i] for i in self.candidates_at(x, y) if point_in_polygon((x, y), self.spots[i].polygon)]
+
+    def occupancy(self, vehicle_centers: np.ndarray) -> dict[str, bool]:
+        """Same result as `spot_occupied` for every spot, but each center is tested against candidates only."""
+        occ = {s.spot_id: False for s in self.spots}
+        for cx, cy in vehicle_centers:
+            for s in self.spots_at(float(cx), float(cy)):
+                occ[s.spot_id] = True
+        return occ
+
+
+class SpotLayout:
+    """Spots from one config, scaled to a frame size; the index is rebuilt only when the size changes.
+
+    With a `homography` (config coordinates -> frame pixels, see `registration.CameraAligner`) the
+    polygons are warped instead of scaled, and the cache is also rebuilt when the homography changes.
+    """
+
+    def __init__(self, spots_cfg: SpotsConfig):
+        self.spots_cfg = spots_cfg
+        # (frame size, homography, spots, index) swapped in as one tuple, so workers scaling for
+        # different frames never get spots for one size and an index for another
+        self._cached: tuple[tuple[int, int], np.ndarray | None, list[Spot], SpotIndex] | None = None
+        self._lock = threading.Lock()
+
+    def scaled(self, frame_size: tuple[int, int], homography: np.ndarray | None = None) -> tuple[list[Spot], SpotIndex]:
+        frame_size = (int(frame_size[0]), int(frame_size[1]))
+        with self._lock:
+            cached = self._cached
+            if cached is not None and cached[0] == frame_size:
+                cached_h = cached[1]
+                if (homography is None and cached_h is None) or (
+                    homography is not None and cached_h is not None and np.array_equal(homography, cached_h)
+                ):
+                    return cached[2], cached[3]
+            if homography is None:
+                spots = scale_spots(self.spots_cfg, frame_size)
+            else:
+                spots = warp_spots(self.spots_cfg.spots, homography)
+            index = SpotIndex(spots)
+            h = None if homography is None else np.array(homography, dtype=np.float64)
+            self._cached = (frame_size, h, spots, index)
+            return spots, index
+
+
+_LAYOUTS: dict[str, tuple[int, SpotLayout]] = {}
+
+
+def load_layout(path: str | Path) -> SpotLayout:
+    """Cached `load_spots` + `SpotLayout`; re-read only when the file's mtime changes."""
+    p = Path(path)
+    mtime = p.stat().st_mtime_ns
+    key = str(p.resolve())
+    cached = _LAYOUTS.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    layout = SpotLayout(load_spots(p))
+    _LAYOUTS[key] = (mtime, layout)
+    return layout
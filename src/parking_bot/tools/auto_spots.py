@@ -0,0 +1,183 @@
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .. import profiling
+from ..config import load_settings
+from ..detect import Detection, VehicleDetector, set_thread_budget
+from ..spots import Spot, save_spots
+from ..video import fit_size, iter_frames, open_video, video_info
+from ..viz import draw_overlay
+
+
+class DensityAccumulator:
+    """Streaming per-cell statistics of parked-vehicle detections; memory depends on the frame size only.
+
+    The frame is split into `cell`-pixel cells. For every vehicle whose cell (or a neighbour) also had a
+    vehicle on the previous sampled frame - i.e. the vehicle did not move away - the cell gets one hit
+    plus the box center and size, so hours of video fold into five small arrays.
+    """
+
+    def __init__(self, frame_size: tuple[int, int], cell: int = 8):
+        self.frame_size = (int(frame_size[0]), int(frame_size[1]))
+        self.cell = max(1, int(cell))
+        w, h = self.frame_size
+        self.shape = (-(-h // self.cell), -(-w // self.cell))
+        # hits, sum of center x, center y, box w, box h
+        self.stats = np.zeros((5, *self.shape), dtype=np.float64)
+        self.frames = 0
+        self.detections = 0
+        self._prev = np.zeros(self.shape, dtype=np.uint8)
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        return self.stats.nbytes + self._prev.nbytes
+
+    def add(self, dets: list[Detection]) -> None:
+        self.frames += 1
+        self.detections += len(dets)
+        cur = np.zeros(self.shape, dtype=np.uint8)
+        if not dets:
+            self._prev = cur
+            return
+        b = np.asarray([d.xyxy for d in dets], dtype=np.float64)
+        cx, cy = (b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2
+        gh, gw = self.shape
+        gx = np.clip((cx // self.cell).astype(np.int64), 0, gw - 1)
+        gy = np.clip((cy // self.cell).astype(np.int64), 0, gh - 1)
+        cur[gy, gx] = 1
+        still = cv2.dilate(self._prev, self._kernel)[gy, gx].astype(bool)
+        self._prev = cur
+        if not still.any():
+            return
+        flat = (gy * gw + gx)[still]
+        n = gh * gw
+        for row, w in enumerate((None, cx, cy, b[:, 2] - b[:, 0], b[:, 3] - b[:, 1])):
+            self.stats[row] += np.bincount(flat, None if w is None else w[still], minlength=n).reshape(self.shape)
+
+    def spots(self, min_presence: float = 0.15, shrink: float = 0.8, window: int = 3) -> list[tuple[Spot, float]]:
+        """Candidate spots with the share of sampled frames a parked vehicle was seen there.
+
+        Hits are summed over `window` x `window` cells (a parked car's center jitters between a few),
+        local maxima above `min_presence` become spots, strongest first; a weaker maximum whose center
+        falls inside an accepted spot is dropped. Each polygon is the mean vehicle box shrunk by `shrink`.
+        """
+        if self.frames == 0:
+            return []
+        k = max(1, int(window)) | 1
+        summed = np.stack([cv2.boxFilter(s, -1, (k, k), normalize=False, borderType=cv2.BORDER_CONSTANT) for s in self.stats])
+        hits = summed[0]
+        peak = (hits >= cv2.dilate(hits, np.ones((k + 2, k + 2), dtype=np.uint8))) & (hits >= min_presence * self.frames)
+        peak &= hits > 0
+        ys, xs = np.nonzero(peak)
+        order = np.argsort(-hits[ys, xs], kind="stable")
+        ys, xs = ys[order], xs[order]
+        n = hits[ys, xs]
+        cx, cy, bw, bh = (summed[i][ys, xs] / n for i in range(1, 5))
+        half_w, half_h = bw * shrink / 2, bh * shrink / 2
+
+        keep: list[int] = []
+        for i in range(len(n)):
+            if keep:
+                j = np.asarray(keep)
+                if np.any((np.abs(cx[j] - cx[i]) < half_w[j]) & (np.abs(cy[j] - cy[i]) < half_h[j])):
+                    continue
+            keep.append(i)
+        if not keep:
+            return []
+
+        # number row by row (top to bottom), left to right within a row
+        j = np.asarray(keep)
+        row_h = max(1.0, float(np.median(bh[j])) / 2)
+        j = j[np.lexsort((cx[j], np.round(cy[j] / row_h)))]
+
+        w, h = self.frame_size
+        out = []
+        for num, i in enumerate(j.tolist(), start=1):
+            x1, x2 = np.clip([cx[i] - half_w[i], cx[i] + half_w[i]], 0, w - 1).round().astype(int).tolist()
+            y1, y2 = np.clip([cy[i] - half_h[i], cy[i] + half_h[i]], 0, h - 1).round().astype(int).tolist()
+            poly = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+            out.append((Spot(spot_id=f"auto_{num}", polygon=poly), float(n[i] / self.frames)))
+        return out
+
+    def heatmap(self) -> np.ndarray:
+        """Hit share per cell as a BGR color map at frame size."""
+        share = self.stats[0] / max(1, self.frames)
+        img = np.clip(share / max(1e-6, float(share.max())) * 255, 0, 255).astype(np.uint8)
+        return cv2.applyColorMap(cv2.resize(img, self.frame_size, interpolation=cv2.INTER_NEAREST), cv2.COLORMAP_JET)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Propose spots.json from where vehicles stay parked in long footage")
+    p.add_argument("--video", default="video.mp4", help="Footage of the lot (same camera as the bot will see)")
+    p.add_argument("--every", type=int, default=5, help="Detect on every N-th frame")
+    p.add_argument("--max-frames", type=int, default=0, help="Max frames to process (0 = all)")
+    p.add_argument("--max-width", type=int, default=0, help="Downscale frames right after decode (0 = keep)")
+    p.add_argument("--cell", type=int, default=8, help="Density cell size in (processed) pixels")
+    p.add_argument("--min-presence", type=float, default=0.15, help="Min share of frames a spot must be occupied")
+    p.add_argument("--shrink", type=float, default=0.8, help="Polygon size relative to the mean vehicle box")
+    p.add_argument("--out", default="data/spots_auto.json", help="Output spots JSON (refine it in parking-web-mark-spots)")
+    p.add_argument("--preview", default="", help="Also save the density map with the proposed spots to this image")
+    profiling.add_argument(p)
+    args = p.parse_args()
+
+    settings = load_settings()
+    det = VehicleDetector(
+        backend=settings.detector_backend,
+        model_dir=settings.model_dir,
+        cfg_name=settings.yolo_cfg,
+        weights_name=settings.yolo_weights,
+        coco_names_name=settings.coco_names,
+        ultralytics_model=settings.ultralytics_model,
+        onnx_model=settings.onnx_model,
+        conf_thres=settings.conf_thres,
+        input_size=settings.input_size,
+    )
+    set_thread_budget(settings.dnn_threads)
+
+    cap = open_video(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {args.video}")
+    size = fit_size(video_info(cap).size, args.max_width)
+    acc = DensityAccumulator(size, cell=args.cell)
+
+    t0 = time.perf_counter()
+    last = None
+    frames = iter_frames(cap, every=args.every, max_frames=args.max_frames, max_width=args.max_width)
+    with profiling.session(args.profile or settings.profile, settings.profile_dir):
+        for _, frame in profiling.iter_span("decode", frames):
+            dets = det.detect(frame)
+            with profiling.span("accumulate"):
+                acc.add(dets)
+            last = frame
+    cap.release()
+    if last is None:
+        raise SystemExit(f"No frames read from {args.video}")
+
+    found = acc.spots(min_presence=args.min_presence, shrink=args.shrink)
+    spots = [s for s, _ in found]
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    save_spots(out_path, spots, size)
+    print(
+        f"{acc.frames} frames, {acc.detections} detections in {time.perf_counter() - t0:.1f}s "
+        f"(density map {acc.nbytes / 1024:.0f} KiB)"
+    )
+    for s, share in found:
+        print(f"  {s.spot_id}: occupied {share:.0%}")
+    print(f"Saved {len(spots)} spots: {out_path}")
+
+    if args.preview:
+        view = cv2.addWeighted(last, 0.6, acc.heatmap(), 0.4, 0)
+        view = draw_overlay(view, spots, {s.spot_id: False for s in spots})
+        Path(args.preview).parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(args.preview, view)
+        print(f"Preview: {args.preview}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from ..classifier import SpotClassifier
+from ..config import Settings, load_settings
+from ..detect import VehicleDetector, centers_from_detections, set_thread_budget, thread_budget
+from ..registration import new_aligner
+from ..spots import load_layout
+from ..viz import draw_overlay
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+CSV_FIELDS = ["image", "spot_id", "occupied", "error"]
+
+
+def collect_images(inputs: list[str]) -> list[Path]:
+    """Files, directories (recursive) and glob patterns -> sorted unique image paths."""
+    found: set[Path] = set()
+    for item in inputs:
+        p = Path(item)
+        if p.is_dir():
+            found.update(f for f in p.rglob("*") if f.suffix.lower() in IMAGE_EXTS and f.is_file())
+        elif p.is_file():
+            found.add(p)
+        else:
+            found.update(Path(f) for f in glob.glob(item, recursive=True) if Path(f).suffix.lower() in IMAGE_EXTS)
+    return sorted(found)
+
+
+# per worker process: the model is loaded once by `_init_worker`, then reused for every image
+_worker: dict = {}
+
+
+def _init_worker(settings: Settings, threads: int, overlay_root: str, overlay_dir: str, align: bool) -> None:
+    set_thread_budget(threads)
+    if settings.occupancy_engine == "classifier":
+        _worker["engine"] = SpotClassifier(settings.spot_classifier)
+        _worker["detector"] = None
+    elif settings.occupancy_engine != "detector":
+        raise ValueError(f"Unknown OCCUPANCY_ENGINE: {settings.occupancy_engine}")
+    else:
+        _worker["engine"] = None
+        _worker["detector"] = VehicleDetector(
+            backend=settings.detector_backend,
+            model_dir=settings.model_dir,
+            cfg_name=settings.yolo_cfg,
+            weights_name=settings.yolo_weights,
+            coco_names_name=settings.coco_names,
+            ultralytics_model=settings.ultralytics_model,
+            onnx_model=settings.onnx_model,
+            conf_thres=settings.conf_thres,
+            input_size=settings.input_size,
+        )
+    _worker["layout"] = load_layout(settings.spots_path)
+    # snapshots are not a stream, so the cheap drift check runs on every image
+    _worker["aligner"] = new_aligner(settings.reference_frame, check_every=1, drift_px=settings.align_drift_px) if align else None
+    _worker["overlay_root"] = overlay_root
+    _worker["overlay_dir"] = Path(overlay_dir) if overlay_dir else None
+
+
+def _analyze(path: str) -> dict:
+    """Occupancy of one image; errors are returned, not raised, so one bad file does not stop the batch."""
+    img = cv2.imread(path)
+    if img is None:
+        return {"image": path, "error": "cannot read image"}
+    try:
+        layout = _worker["layout"]
+        size = (img.shape[1], img.shape[0])
+        aligner = _worker["aligner"]
+        homography = aligner.homography(img, layout.spots_cfg.image_size) if aligner is not None else None
+        spots, index = layout.scaled(size, homography)
+        if _worker["engine"] is not None:
+            occ, dets = _worker["engine"].occupancy(None, img, spots, index)
+        else:
+            dets = _worker["detector"].detect(img, index)
+            occ = index.occupancy(centers_from_detections(dets))
+        if _worker["overlay_dir"] is not None:
+            # mirror the input tree so same-named files from different folders do not collide
+            rel = os.path.relpath(os.path.abspath(path), _worker["overlay_root"])
+            out = (_worker["overlay_dir"] / rel).with_suffix(".jpg")
+            out.parent.mkdir(parents=True, exist_ok=True)
+            cv2.imwrite(str(out), draw_overlay(img, spots, occ, detections=dets))
+    except Exception as e:
+        return {"image": path, "error": f"{type(e).__name__}: {e}"}
+    free = sum(1 for v in occ.values() if not v)
+    return {"image": path, "size": list(size), "free": free, "total": len(occ), "occupied": occ}
+
+
+def _format(res: dict, fmt: str) -> str:
+    """All output for one image as a single string, so it is appended with one write."""
+    if fmt == "jsonl":
+        return json.dumps(res, ensure_ascii=False) + "\n"
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    if "error" in res:
+        w.writerow([res["image"], "", "", res["error"]])
+    for sid, v in res.get("occupied", {}).items():
+        w.writerow([res["image"], sid, int(v), ""])
+    return buf.getvalue()
+
+
+def _resume(out_path: Path, fmt: str) -> set[str]:
+    """Images already in `out_path`. The last one may have been cut off mid-write, so it is removed and
+    redone; so are error rows (a file still being copied, a transient failure), which are retried."""
+    if not out_path.exists() or out_path.stat().st_size == 0:
+        return set()
+    data = out_path.read_bytes()
+    lines = data.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    if fmt == "csv" and lines and lines[0].decode("utf-8", "replace").startswith(CSV_FIELDS[0] + ","):
+        header, body = [lines[0]], lines[1:]
+    else:
+        header, body = [], lines
+    rows: list[tuple[str | None, bool]] = []  # (image, error)
+    for line in body:
+        try:
+            if fmt == "jsonl":
+                rec = json.loads(line)
+                rows.append((rec["image"], bool(rec.get("error"))))
+            else:
+                row = next(csv.reader([line.decode("utf-8")]))
+                rows.append((row[0], len(row) > 3 and bool(row[3])))
+        except (ValueError, KeyError, IndexError, StopIteration):
+            rows.append((None, False))
+    if not rows:
+        return set()
+    last = rows[-1][0]
+    keep = len(rows)
+    while keep and rows[keep - 1][0] == last:
+        keep -= 1
+    kept = header + [line for line, (img, err) in zip(body[:keep], rows[:keep]) if img is not None and not err]
+    out_path.write_bytes(b"".join(line + b"\n" for line in kept))
+    return {img for img, err in rows[:keep] if img is not None and not err}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Batch occupancy over many images with a pool of model-loaded workers")
+    p.add_argument("inputs", nargs="+", help="Image files, directories (recursive) or glob patterns ('snaps/**/*.jpg')")
+    p.add_argument("--out", default="occupancy.csv", help="Output .csv (one row per image and spot) or .jsonl (per image)")
+    p.add_argument("--workers", type=int, default=0, help="Worker processes (0 = cores; 1 = run in this process)")
+    p.add_argument("--overlays", default="", help="Also save annotated images under this directory (off = faster)")
+    p.add_argument("--align", action="store_true", help="Register images against REFERENCE_FRAME (also on with CAMERA_ALIGN)")
+    p.add_argument("--no-resume", action="store_true", help="Overwrite --out instead of skipping images already in it (failed ones are always retried)")
+    p.add_argument("--chunk", type=int, default=8, help="Images sent to a worker at a time")
+    args = p.parse_args()
+
+    settings = load_settings()
+    out_path = Path(args.out)
+    fmt = "jsonl" if out_path.suffix.lower() in (".jsonl", ".ndjson") else "csv"
+    images = collect_images(args.inputs)
+    if not images:
+        raise SystemExit("No images found")
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if args.no_resume and out_path.exists():
+        out_path.unlink()
+    done = _resume(out_path, fmt)
+    todo = [str(p) for p in images if str(p) not in done]
+    workers = args.workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(todo) or 1))
+    print(f"{len(images)} images, {len(images) - len(todo)} already in {out_path}, {len(todo)} to do, {workers} workers", file=sys.stderr)
+    if not todo:
+        return
+
+    overlay_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in todo]) if args.overlays else ""
+    align = args.align or settings.camera_align
+    init_args = (settings, thread_budget(settings.dnn_threads, workers), overlay_root, args.overlays, align)
+
+    t0 = time.perf_counter()
+    n = errors = 0
+    new_file = not out_path.exists() or out_path.stat().st_size == 0
+    with open(out_path, "a", encoding="utf-8", newline="") as f:
+        if new_file and fmt == "csv":
+            f.write(",".join(CSV_FIELDS) + "\n")
+        if workers == 1:
+            _init_worker(*init_args)
+            results = map(_analyze, todo)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args)
+            # `map` yields in input order, so the file stays ordered and a rerun only has to redo its tail
+            results = pool.map(_analyze, todo, chunksize=max(1, args.chunk))
+        try:
+            for res in results:
+                f.write(_format(res, fmt))
+                f.flush()
+                n += 1
+                errors += "error" in res
+                if n % 100 == 0:
+                    rate = n / (time.perf_counter() - t0)
+                    print(f"{n}/{len(todo)} images, {rate:.1f}/s", file=sys.stderr)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    dt = time.perf_counter() - t0
+    print(f"Done: {n} images in {dt:.1f}s ({n / max(dt, 1e-9):.1f}/s), {errors} errors -> {out_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
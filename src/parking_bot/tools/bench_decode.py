@@ -0,0 +1,63 @@
+import argparse
+import time
+
+from ..video import iter_frames, open_video
+
+
+def _read_all(path: str, every: int) -> int:
+    # baseline: decode every frame, keep every N-th
+    cap = open_video(path)
+    idx = 0
+    kept = 0
+    while True:
+        ok, fr = cap.read()
+        if not ok or fr is None:
+            break
+        if idx % every == 0:
+            kept += 1
+        idx += 1
+    cap.release()
+    return kept
+
+
+def _iter(path: str, every: int, max_width: int, seek: bool, hw_accel: bool = False) -> int:
+    cap = open_video(path, hw_accel=hw_accel)
+    kept = sum(1 for _ in iter_frames(cap, every=every, max_width=max_width, seek_stride=1 if seek else 0))
+    cap.release()
+    return kept
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark video decode: read-all vs grab/retrieve vs seek")
+    p.add_argument("--video", default="video.mp4", help="Path to input video")
+    p.add_argument("--every", default="1,5,25", help="Comma-separated frame strides")
+    p.add_argument("--max-width", type=int, default=0, help="Also downscale kept frames to this width")
+    p.add_argument("--hw-accel", action="store_true", help="Add a run with hardware decoding requested")
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    modes = {
+        "read": lambda e: _read_all(args.video, e),
+        "grab": lambda e: _iter(args.video, e, args.max_width, seek=False),
+        "seek": lambda e: _iter(args.video, e, args.max_width, seek=True),
+    }
+    if args.hw_accel:
+        modes["grab+hw"] = lambda e: _iter(args.video, e, args.max_width, seek=False, hw_accel=True)
+
+    print(f"{'every':>6} {'mode':>8} {'kept':>6} {'sec':>8} {'kept fps':>9} {'vs read':>8}")
+    for every in [int(x) for x in args.every.split(",") if x.strip()]:
+        base = None
+        for name, fn in modes.items():
+            best = float("inf")
+            kept = 0
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                kept = fn(every)
+                best = min(best, time.perf_counter() - t0)
+            if base is None:
+                base = best
+            print(f"{every:>6} {name:>8} {kept:>6} {best:>8.3f} {kept / max(best, 1e-9):>9.1f} {base / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
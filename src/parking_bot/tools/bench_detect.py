@@ -0,0 +1,81 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ..config import load_settings
+from ..detect import VehicleDetector, set_thread_budget, thread_budget
+from ..video import iter_frames, open_video
+
+
+def _run(det: VehicleDetector, frames: list[np.ndarray], workers: int, lock: "threading.Lock | None") -> list[float]:
+    """Detect on every frame with `workers` threads; per-frame latencies in seconds."""
+
+    def one(fr: np.ndarray) -> float:
+        t0 = time.perf_counter()
+        if lock is None:
+            det.detect(fr)
+        else:
+            with lock:
+                det.detect(fr)
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(one, frames))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark detector throughput: concurrent workers x DNN threads")
+    p.add_argument("--video", default="video.mp4", help="Frames to detect on")
+    p.add_argument("--frames", type=int, default=48, help="Frames per configuration")
+    p.add_argument("--workers", default="1,2,4", help="Comma-separated concurrent inference counts")
+    p.add_argument("--threads", default="0,1", help="Comma-separated threads per inference (0 = cores / workers)")
+    p.add_argument("--no-lock-baseline", action="store_true", help="Skip the single shared net behind a lock")
+    args = p.parse_args()
+
+    settings = load_settings()
+    det = VehicleDetector(
+        backend=settings.detector_backend,
+        model_dir=settings.model_dir,
+        cfg_name=settings.yolo_cfg,
+        weights_name=settings.yolo_weights,
+        coco_names_name=settings.coco_names,
+        ultralytics_model=settings.ultralytics_model,
+        onnx_model=settings.onnx_model,
+        conf_thres=settings.conf_thres,
+        input_size=settings.input_size,
+    )
+    cap = open_video(args.video)
+    frames = [fr for _, fr in iter_frames(cap, every=1, max_frames=args.frames)]
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames read from {args.video}")
+
+    # warm-up: first forward allocates
+    det.detect(frames[0])
+    print(f"{os.cpu_count()} cores, {len(frames)} frames, backend {det.backend}")
+    print(f"{'workers':>7} {'threads':>7} {'mode':>6} {'fps':>7} {'p50 ms':>8} {'p95 ms':>8} {'nets':>5}")
+    for workers in [int(x) for x in args.workers.split(",") if x.strip()]:
+        # grow the pool to `workers` nets outside the timed runs
+        _run(det, frames[:workers], workers, None)
+        budgets = dict.fromkeys(thread_budget(int(x), workers) for x in args.threads.split(",") if x.strip())
+        for n_threads in budgets:
+            set_thread_budget(n_threads)
+            modes = {"pool": None}
+            if not args.no_lock_baseline and workers > 1:
+                modes["lock"] = threading.Lock()
+            for mode, lock in modes.items():
+                t0 = time.perf_counter()
+                lat = np.asarray(_run(det, frames, workers, lock)) * 1e3
+                wall = time.perf_counter() - t0
+                print(
+                    f"{workers:>7} {n_threads:>7} {mode:>6} {len(frames) / wall:>7.1f} "
+                    f"{np.percentile(lat, 50):>8.1f} {np.percentile(lat, 95):>8.1f} {det.pooled_nets:>5}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import time
+
+import numpy as np
+
+from ..spots import Spot, SpotIndex, spot_occupied
+
+
+def _synthetic_spots(n: int, spot_w: int = 40, spot_h: int = 80, gap: int = 6) -> tuple[list[Spot], tuple[int, int]]:
+    cols = int(np.ceil(np.sqrt(n * spot_h / spot_w)))
+    spots: list[Spot] = []
+    for i in range(n):
+        r, c = divmod(i, cols)
+        x0 = c * (spot_w + gap)
+        y0 = r * (spot_h + gap)
+        poly = [(x0, y0), (x0 + spot_w, y0), (x0 + spot_w, y0 + spot_h), (x0, y0 + spot_h)]
+        spots.append(Spot(spot_id=f"s{i}", polygon=poly))
+    rows = (n + cols - 1) // cols
+    return spots, (cols * (spot_w + gap), rows * (spot_h + gap))
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark spot lookup: full scan vs grid index")
+    p.add_argument("--sizes", default="100,1000,10000", help="Comma-separated spot counts")
+    p.add_argument("--dets", type=int, default=200, help="Detections per frame")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'spots':>8} {'dets':>6} {'build ms':>9} {'scan ms':>10} {'index ms':>9} {'speedup':>8}")
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        spots, (w, h) = _synthetic_spots(n)
+        k = max(1, args.dets)
+        centers = (rng.random((k, 2)) * (w, h)).astype(np.float32)
+
+        t_build = _timeit(lambda: SpotIndex(spots), 1)
+        index = SpotIndex(spots)
+
+        scan: dict[str, bool] = {}
+
+        def run_scan() -> None:
+            scan.update({s.spot_id: spot_occupied(s, centers) for s in spots})
+
+        # the full scan is slow at 10k; one pass is enough there
+        t_scan = _timeit(run_scan, 1 if n * k > 500_000 else args.repeat)
+        t_index = _timeit(lambda: index.occupancy(centers), args.repeat)
+
+        if index.occupancy(centers) != scan:
+            raise SystemExit(f"Index result differs from full scan at n={n}")
+
+        print(
+            f"{n:>8} {k:>6} {t_build * 1e3:>9.1f} {t_scan * 1e3:>10.1f} {t_index * 1e3:>9.2f} "
+            f"{t_scan / max(t_index, 1e-9):>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import json
+import random
+import shutil
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from ..config import load_settings
+from ..detect import VEHICLE_LABELS, VehicleDetector, canon_label
+
+_IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def _images(d: Path) -> list[Path]:
+    return sorted(p for p in d.rglob("*") if p.suffix.lower() in _IMG_EXTS)
+
+
+def pseudo_label(teacher: VehicleDetector, images: list[Path], classes: list[str], out: Path, val_frac: float) -> Path:
+    """Label frames with the stock detector (teacher) and write a YOLO dataset for the student."""
+    # (index, path): the index prefixes output names, so same-named frames from different folders stay apart
+    items = list(enumerate(images))
+    random.Random(0).shuffle(items)
+    n_val = max(1, int(len(items) * val_frac))
+    for split, part in (("val", items[:n_val]), ("train", items[n_val:])):
+        (out / "images" / split).mkdir(parents=True, exist_ok=True)
+        (out / "labels" / split).mkdir(parents=True, exist_ok=True)
+        for i, p in part:
+            img = cv2.imread(str(p))
+            if img is None:
+                continue
+            h, w = img.shape[:2]
+            lines = []
+            for d in teacher.detect(img):
+                # a single-class student folds every vehicle into that class
+                if d.label not in classes and len(classes) > 1:
+                    continue
+                k = classes.index(d.label) if d.label in classes else 0
+                x1, y1, x2, y2 = d.xyxy
+                cx, cy, bw, bh = (x1 + x2) / 2 / w, (y1 + y2) / 2 / h, (x2 - x1) / w, (y2 - y1) / h
+                lines.append(f"{k} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}")
+            name = f"{i:06d}_{p.stem}"
+            shutil.copy2(p, out / "images" / split / (name + p.suffix))
+            (out / "labels" / split / (name + ".txt")).write_text("\n".join(lines), encoding="utf-8")
+
+    data_yaml = out / "data.yaml"
+    cfg = {"path": str(out.resolve()), "train": "images/train", "val": "images/val", "names": dict(enumerate(classes))}
+    data_yaml.write_text(yaml.safe_dump(cfg, sort_keys=False), encoding="utf-8")
+    return data_yaml
+
+
+def student_yaml(classes: list[str], width: float, out: Path) -> Path:
+    """YOLOv8 architecture with `nc` vehicle classes and every layer's channels scaled by `width`."""
+    from ultralytics.nn.tasks import yaml_model_load
+
+    cfg = yaml_model_load("yolov8n.yaml")
+    cfg["nc"] = len(classes)
+    cfg["scales"] = {"n": [0.33, width, 1024]}
+    cfg["scale"] = "n"
+    path = out / "student.yaml"
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False), encoding="utf-8")
+    return path
+
+
+def _latency_ms(det: VehicleDetector, images: list[np.ndarray], size: int, warmup: int = 3) -> float:
+    for img in images[:warmup]:
+        det.detect(img, size=size)
+    t0 = time.perf_counter()
+    for img in images:
+        det.detect(img, size=size)
+    return (time.perf_counter() - t0) / max(1, len(images)) * 1e3
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Fine-tune, slim down and export a vehicle-only detector")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--images", help="Unlabelled frames (e.g. from parking-extract-dataset) to pseudo-label")
+    src.add_argument("--data", help="Existing labelled dataset YAML (class names are mapped to car/motorcycle/bus/truck)")
+    p.add_argument("--classes", default="car,motorcycle,bus,truck", help="1-4 vehicle classes for --images")
+    p.add_argument("--base", default="yolov8n.pt", help="Pretrained weights to start from")
+    p.add_argument(
+        "--width",
+        type=float,
+        default=0.0,
+        help=(
+            "Channel width multiplier of a slimmer student (e.g. 0.125; 0 = keep base). Trained from scratch: "
+            "--base weights do not fit the narrower layers, so give it more --epochs"
+        ),
+    )
+    p.add_argument("--epochs", type=int, default=50)
+    p.add_argument("--imgsz", type=int, default=320)
+    p.add_argument("--batch", type=int, default=16)
+    p.add_argument("--out", default="data/models/vehicle", help="Output dir for vehicle.onnx + vehicle.json")
+    p.add_argument("--bench", type=int, default=30, help="Images for the latency comparison (0 = skip)")
+    args = p.parse_args()
+
+    try:
+        from ultralytics import YOLO
+    except Exception as e:
+        raise SystemExit(
+            "Ultralytics is not installed.\n"
+            "Install training extra and retry:\n"
+            "  uv sync --extra train\n"
+        ) from e
+
+    settings = load_settings()
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    stock = VehicleDetector(
+        backend="opencv",
+        model_dir=settings.model_dir,
+        cfg_name=settings.yolo_cfg,
+        weights_name=settings.yolo_weights,
+        coco_names_name=settings.coco_names,
+        conf_thres=settings.conf_thres,
+    )
+
+    if args.images:
+        classes = [canon_label(c) for c in args.classes.split(",") if c.strip()]
+        if not 1 <= len(classes) <= 4 or not set(classes) <= VEHICLE_LABELS:
+            raise SystemExit(f"--classes must list 1-4 of: {', '.join(sorted(VEHICLE_LABELS))}")
+        frames = _images(Path(args.images))
+        if not frames:
+            raise SystemExit(f"No images in {args.images}")
+        print(f"Pseudo-labelling {len(frames)} frames with the stock detector...")
+        data_yaml = pseudo_label(stock, frames, classes, out / "dataset", val_frac=0.15)
+    else:
+        data_yaml = Path(args.data)
+        names = yaml.safe_load(data_yaml.read_text(encoding="utf-8"))["names"]
+        raw = list(names.values()) if isinstance(names, dict) else list(names)
+        # the ONNX backend keeps only canonical vehicle labels, so the exported names must use them
+        classes = [canon_label(str(n)) for n in raw]
+        if not set(classes) & VEHICLE_LABELS:
+            raise SystemExit(
+                f"No class in {data_yaml} is a vehicle ({', '.join(map(str, raw))}); "
+                f"rename them to {', '.join(sorted(VEHICLE_LABELS))}"
+            )
+        ignored = [str(r) for r, c in zip(raw, classes) if c not in VEHICLE_LABELS]
+        if ignored:
+            print(f"Not vehicles, ignored at detection time: {', '.join(ignored)}")
+
+    if args.width > 0:
+        model = YOLO(str(student_yaml(classes, args.width, out)))
+    else:
+        model = YOLO(args.base)
+    model.train(
+        data=str(data_yaml),
+        epochs=args.epochs,
+        imgsz=args.imgsz,
+        batch=args.batch,
+        device="cpu",
+        project=str(out / "runs"),
+        name="student",
+        exist_ok=True,
+    )
+
+    best = out / "runs" / "student" / "weights" / "best.pt"
+    onnx_path = Path(YOLO(str(best)).export(format="onnx", imgsz=args.imgsz, opset=12, dynamic=False))
+    dst = out / "vehicle.onnx"
+    shutil.copy2(onnx_path, dst)
+    dst.with_suffix(".json").write_text(json.dumps({"names": classes, "imgsz": args.imgsz}), encoding="utf-8")
+    print(f"Saved: {dst} (+ {dst.with_suffix('.json').name})")
+
+    if args.bench:
+        bench_src = _images(Path(args.images)) if args.images else _images(data_yaml.parent)
+        imgs = [im for im in (cv2.imread(str(x)) for x in bench_src[: args.bench]) if im is not None]
+        student = VehicleDetector(backend="onnx", onnx_model=str(dst), conf_thres=settings.conf_thres)
+        # the speedup compares models at the same input size; the stock size is shown for reference
+        same = _latency_ms(stock, imgs, student.input_size)
+        rows = [(f"stock yolov4-tiny @{student.input_size}", same, same)]
+        if stock.input_size != student.input_size:
+            ms = _latency_ms(stock, imgs, stock.input_size)
+            rows.insert(0, (f"stock yolov4-tiny @{stock.input_size}", ms, ms))
+        rows.append((f"vehicle student @{student.input_size}", _latency_ms(student, imgs, student.input_size), same))
+        print(f"{'model':<28} {'ms/img':>8} {'speedup':>8}")
+        for name, ms, base in rows:
+            print(f"{name:<28} {ms:>8.1f} {base / ms:>7.2f}x")
+    print(f"Use it: DETECTOR_BACKEND=onnx ONNX_MODEL={dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 import argparse
+import time
 from pathlib import Path
 
 import cv2
 
+from .. import profiling
+from ..background import FastPath, new_fast_path
+from ..classifier import SpotClassifier
 from ..config import load_settings
-from ..detect import VehicleDetector, centers_from_detections
-from ..spots import load_spots, scale_spots, spot_occupied
+from ..detect import VehicleDetector, centers_from_detections, set_thread_budget
+from ..history import OccupancyStore
+from ..registration import new_aligner
+from ..spots import load_layout
+from ..video import fit_size, iter_frames, open_video, video_info
 from ..viz import draw_overlay
 
 
@@ -35,66 +42,126 @@ def main() -> None:
     p.add_argument("--every", type=int, default=1, help="Process every N-th frame")
     p.add_argument("--max-frames", type=int, default=0, help="Max frames to process (0 = all)")
     p.add_argument("--no-dets", action="store_true", help="Do not draw detection bboxes (only spots)")
+    p.add_argument("--max-width", type=int, default=0, help="Downscale frames right after decode (0 = keep)")
+    p.add_argument(
+        "--seek-stride",
+        type=int,
+        default=0,
+        help="Seek instead of grabbing skipped frames when --every >= this (0 = never seek)",
+    )
+    p.add_argument("--hw-accel", action="store_true", help="Request hardware video decoding if available")
+    p.add_argument("--history", default="", help="Append per-frame occupancy to this history store dir")
+    p.add_argument(
+        "--fast-path",
+        action="store_true",
+        help="Skip the detector on frames where the empty-spot background model is sure about every spot",
+    )
+    p.add_argument("--empty-lot", default="", help="Photo of the empty lot to seed --fast-path (default: EMPTY_LOT_IMAGE)")
+    p.add_argument(
+        "--classifier",
+        nargs="?",
+        const="-",
+        default="",
+        help="Per-spot CNN instead of the detector; optional path (default: SPOT_CLASSIFIER)",
+    )
+    p.add_argument(
+        "--align",
+        nargs="?",
+        const="-",
+        default="",
+        help="Compensate camera shifts against the reference frame; optional path (default: REFERENCE_FRAME)",
+    )
+    profiling.add_argument(p)
+    p.add_argument("--start-ts", type=float, default=0.0, help="Unix time of the first video frame (default: now)")
     args = p.parse_args()
 
     settings = load_settings()
-    spots_cfg = load_spots(settings.spots_path)
+    layout = load_layout(settings.spots_path)
 
-    cap = cv2.VideoCapture(args.video)
+    cap = open_video(args.video, hw_accel=args.hw_accel)
     if not cap.isOpened():
         raise SystemExit(f"Cannot open video: {args.video}")
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
-    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-    det = VehicleDetector(
-        backend=settings.detector_backend,
-        model_dir=settings.model_dir,
-        cfg_name=settings.yolo_cfg,
-        weights_name=settings.yolo_weights,
-        coco_names_name=settings.coco_names,
-        ultralytics_model=settings.ultralytics_model,
-        conf_thres=settings.conf_thres,
-    )
+    info = video_info(cap)
+    fps = info.fps
+    w, h = fit_size(info.size, args.max_width)
+
+    # the per-spot classifier needs no detector at all
+    det = None
+    if not args.classifier:
+        det = VehicleDetector(
+            backend=settings.detector_backend,
+            model_dir=settings.model_dir,
+            cfg_name=settings.yolo_cfg,
+            weights_name=settings.yolo_weights,
+            coco_names_name=settings.coco_names,
+            ultralytics_model=settings.ultralytics_model,
+            onnx_model=settings.onnx_model,
+            conf_thres=settings.conf_thres,
+            input_size=settings.input_size,
+        )
+    set_thread_budget(settings.dnn_threads)
 
-    spots = scale_spots(spots_cfg, (w, h))
+    spots, index = layout.scaled((w, h))
 
     out_path = Path(args.out)
     writer = _make_writer(out_path, fps, (w, h))
 
-    idx = 0
-    written = 0
     last_occ = {s.spot_id: False for s in spots}
+    history = OccupancyStore(args.history, [s.spot_id for s in spots]) if args.history else None
+    start_ts = args.start_ts or time.time()
+    if args.classifier:
+        engine = SpotClassifier(settings.spot_classifier if args.classifier == "-" else args.classifier)
+    elif args.fast_path:
+        engine = new_fast_path(layout, args.empty_lot or settings.empty_lot_image)
+    else:
+        engine = None
+    aligner = None
+    if args.align or settings.camera_align:
+        aligner = new_aligner(
+            settings.reference_frame if args.align in ("", "-") else args.align,
+            check_every=settings.align_check_every,
+            drift_px=settings.align_drift_px,
+        )
 
-    while True:
-        ok, frame = cap.read()
-        if not ok or frame is None:
-            break
-
-        if args.every > 1 and (idx % args.every != 0):
-            idx += 1
-            continue
-
-        dets = det.detect(frame)
-        centers = centers_from_detections(dets)
-        occ = {s.spot_id: spot_occupied(s, centers) for s in spots}
-        last_occ = occ
-
-        overlay = draw_overlay(frame, spots, occ, detections=None if args.no_dets else dets)
-        writer.write(overlay)
-        written += 1
-
-        idx += 1
-        if args.max_frames and written >= args.max_frames:
-            break
+    frames = iter_frames(
+        cap,
+        every=args.every,
+        max_frames=args.max_frames,
+        max_width=args.max_width,
+        seek_stride=args.seek_stride,
+    )
+    with profiling.session(args.profile or settings.profile, settings.profile_dir):
+        for idx, frame in profiling.iter_span("decode", frames):
+            if aligner is not None:
+                spots, index = layout.scaled((w, h), aligner.homography(frame, layout.spots_cfg.image_size))
+            with profiling.span("occupancy"):
+                if engine is not None:
+                    occ, dets = engine.occupancy(det, frame, spots, index)
+                else:
+                    dets = det.detect(frame, index)
+                    occ = index.occupancy(centers_from_detections(dets))
+            last_occ = occ
+            if history is not None:
+                history.append(start_ts + idx / fps, occ)
+
+            with profiling.span("overlay"):
+                overlay = draw_overlay(frame, spots, occ, detections=None if args.no_dets else dets)
+            with profiling.span("encode"):
+                writer.write(overlay)
 
     cap.release()
     writer.release()
+    if history is not None:
+        history.close()
 
     total = len(spots)
     free = sum(1 for s in spots if not last_occ.get(s.spot_id, False))
     print(f"Saved: {out_path} | last FREE {free}/{total}")
+    if isinstance(engine, FastPath):
+        print(f"Detector skipped on {engine.skipped}/{engine.calls} frames")
+    if aligner is not None:
+        print(f"Camera registered {aligner.registrations} times ({aligner.failures} failed) over {aligner.frames} frames")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+import argparse
+import csv
+import itertools
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from ..config import load_settings
+from ..detect import Detection, VehicleDetector, centers_from_detections
+from ..spots import load_layout
+
+_IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+@dataclass(frozen=True)
+class Sample:
+    path: Path
+    image: np.ndarray
+    gt: np.ndarray  # (n, 4) xyxy in pixels
+
+
+@dataclass
+class Result:
+    backend: str
+    input_size: int
+    conf_thres: float
+    nms_thres: float
+    map50: float
+    map50_95: float
+    precision: float
+    recall: float
+    occ_acc: float
+    latency_ms: float
+    p95_ms: float
+    fps: float
+    pareto: bool = False
+
+
+def _read_labels(path: Path, w: int, h: int) -> np.ndarray:
+    """YOLO txt labels -> xyxy pixels; polygon (segmentation) rows are reduced to their bbox."""
+    boxes = []
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            vals = [float(x) for x in line.split()[1:]]
+            if len(vals) == 4:
+                cx, cy, bw, bh = vals
+                boxes.append(((cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h))
+            elif len(vals) >= 6:
+                xs = np.array(vals[0::2]) * w
+                ys = np.array(vals[1::2]) * h
+                boxes.append((xs.min(), ys.min(), xs.max(), ys.max()))
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def load_split(data_yaml: str | Path, split: str) -> list[Sample]:
+    data_yaml = Path(data_yaml)
+    cfg = yaml.safe_load(data_yaml.read_text(encoding="utf-8"))
+    base = Path(cfg.get("path") or data_yaml.parent)
+    rel = cfg.get({"valid": "val"}.get(split, split))
+    if rel is None:
+        raise SystemExit(f"Split '{split}' not found in {data_yaml}")
+    img_dir = base / rel
+    if not img_dir.exists():
+        # Roboflow exports point at '../<split>/images' although the split sits next to data.yaml
+        img_dir = data_yaml.parent / Path(rel).parent.name / Path(rel).name
+
+    samples = []
+    for p in sorted(img_dir.iterdir()):
+        if p.suffix.lower() not in _IMG_EXTS:
+            continue
+        img = cv2.imread(str(p))
+        if img is None:
+            continue
+        h, w = img.shape[:2]
+        gt = _read_labels(p.parent.parent / "labels" / (p.stem + ".txt"), w, h)
+        samples.append(Sample(path=p, image=img, gt=gt))
+    if not samples:
+        raise SystemExit(f"No images in {img_dir}")
+    return samples
+
+
+def _iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def average_precision(
+    preds: list[list[Detection]], gts: list[np.ndarray], iou_thres: float
+) -> tuple[float, float, float]:
+    """Class-agnostic AP (all-point interpolation) plus precision/recall of the whole prediction set."""
+    n_gt = sum(len(g) for g in gts)
+    flat = sorted(
+        ((d.conf, i, np.array(d.xyxy, dtype=np.float32)) for i, ds in enumerate(preds) for d in ds),
+        key=lambda x: -x[0],
+    )
+    if n_gt == 0 or not flat:
+        return 0.0, 0.0, 0.0
+    used = [np.zeros(len(g), dtype=bool) for g in gts]
+    tp = np.zeros(len(flat))
+    for k, (_, i, box) in enumerate(flat):
+        if len(gts[i]) == 0:
+            continue
+        ious = _iou(box, gts[i])
+        ious[used[i]] = -1
+        j = int(np.argmax(ious))
+        if ious[j] >= iou_thres:
+            used[i][j] = True
+            tp[k] = 1
+    ctp = np.cumsum(tp)
+    recall = ctp / n_gt
+    precision = ctp / np.arange(1, len(flat) + 1)
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
+    ap = float(np.sum((mrec[1:] - mrec[:-1]) * mpre[1:]))
+    return ap, float(precision[-1]), float(recall[-1])
+
+
+def occupancy_accuracy(samples: list[Sample], preds: list[list[Detection]], spots_path: str | None) -> float:
+    """Share of (image, spot) pairs where predicted occupancy matches occupancy from the labels."""
+    if not spots_path or not Path(spots_path).exists():
+        return float("nan")
+    layout = load_layout(spots_path)
+    hits = 0
+    total = 0
+    for s, dets in zip(samples, preds):
+        _, index = layout.scaled((s.image.shape[1], s.image.shape[0]))
+        gt_centers = np.stack(((s.gt[:, 0] + s.gt[:, 2]) / 2, (s.gt[:, 1] + s.gt[:, 3]) / 2), axis=1)
+        gt_occ = index.occupancy(gt_centers)
+        pred_occ = index.occupancy(centers_from_detections(dets))
+        hits += sum(1 for k, v in gt_occ.items() if pred_occ.get(k) == v)
+        total += len(gt_occ)
+    return hits / total if total else float("nan")
+
+
+def mark_pareto(results: list[Result], metric: str) -> None:
+    """A config is on the front if no other one is at least as fast and strictly more accurate (or vice versa)."""
+    for r in results:
+        a = getattr(r, metric)
+        r.pareto = not any(
+            (o.latency_ms <= r.latency_ms and getattr(o, metric) > a)
+            or (o.latency_ms < r.latency_ms and getattr(o, metric) >= a)
+            for o in results
+            if o is not r
+        )
+
+
+def _floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Offline accuracy vs speed sweep of VehicleDetector settings")
+    p.add_argument("--data", default="data/roboflow_dataset/data.yaml", help="Dataset YAML (YOLO format)")
+    p.add_argument("--split", default="valid", help="Dataset split: train / valid / test")
+    p.add_argument("--backends", default="opencv", help="Comma-separated: opencv,ultralytics,onnx (onnx runs only at its exported size)")
+    p.add_argument("--sizes", default="320,416,512,608", help="Comma-separated input sizes")
+    p.add_argument("--conf", default="0.1,0.25,0.4", help="Comma-separated confidence thresholds")
+    p.add_argument("--nms", default="0.4", help="Comma-separated NMS IoU thresholds")
+    p.add_argument("--spots", default=None, help="spots.json for occupancy accuracy (default: PARKING_SPOTS_PATH)")
+    p.add_argument("--metric", default="map50", choices=["map50", "map50_95", "occ_acc"], help="Pareto accuracy axis")
+    p.add_argument("--warmup", type=int, default=2, help="Untimed warm-up images per config")
+    p.add_argument("--csv", default="", help="Also write all results to this CSV")
+    args = p.parse_args()
+
+    settings = load_settings()
+    samples = load_split(args.data, args.split)
+    gts = [s.gt for s in samples]
+    spots_path = args.spots or settings.spots_path
+    confs = sorted(_floats(args.conf))
+    print(f"{len(samples)} images, {sum(len(g) for g in gts)} labelled vehicles", file=sys.stderr)
+
+    results: list[Result] = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        det = VehicleDetector(
+            backend=backend,
+            model_dir=settings.model_dir,
+            cfg_name=settings.yolo_cfg,
+            weights_name=settings.yolo_weights,
+            coco_names_name=settings.coco_names,
+            ultralytics_model=settings.ultralytics_model,
+            onnx_model=settings.onnx_model,
+        )
+        sizes = [int(x) for x in _floats(args.sizes)]
+        if det.backend == "onnx":
+            # exported with a static input shape: other sizes cannot be fed to the net
+            if sizes != [det.input_size]:
+                print(f"onnx: sweeping only the exported size {det.input_size}", file=sys.stderr)
+            sizes = [det.input_size]
+        for size, nms in itertools.product(sizes, _floats(args.nms)):
+            det.nms_thres = nms
+            for s in samples[: args.warmup]:
+                det.detect(s.image, size=size, conf=confs[0])
+
+            # one pass at the lowest threshold; NMS output filtered at a higher threshold is identical
+            # to running at that threshold, so higher confs reuse it (latency is measured at the lowest)
+            raw: list[list[Detection]] = []
+            times = []
+            for s in samples:
+                t0 = time.perf_counter()
+                raw.append(det.detect(s.image, size=size, conf=confs[0]))
+                times.append(time.perf_counter() - t0)
+            times_ms = np.array(times) * 1e3
+
+            for conf in confs:
+                preds = [[d for d in ds if d.conf >= conf] for ds in raw]
+                ap50, prec, rec = average_precision(preds, gts, 0.5)
+                ap_all = [average_precision(preds, gts, t)[0] for t in np.arange(0.5, 0.96, 0.05)]
+                results.append(
+                    Result(
+                        backend=backend,
+                        input_size=size,
+                        conf_thres=conf,
+                        nms_thres=nms,
+                        map50=ap50,
+                        map50_95=float(np.mean(ap_all)),
+                        precision=prec,
+                        recall=rec,
+                        occ_acc=occupancy_accuracy(samples, preds, spots_path),
+                        latency_ms=float(times_ms.mean()),
+                        p95_ms=float(np.percentile(times_ms, 95)),
+                        fps=len(samples) / max(1e-9, float(np.sum(times))),
+                    )
+                )
+
+    mark_pareto(results, args.metric)
+    results.sort(key=lambda r: (r.latency_ms, -getattr(r, args.metric)))
+    print(
+        f"{'':1} {'backend':<11} {'size':>4} {'conf':>5} {'nms':>4} {'mAP50':>6} {'mAP50-95':>8} "
+        f"{'P':>5} {'R':>5} {'occ':>5} {'ms':>7} {'p95':>7} {'fps':>6}"
+    )
+    for r in results:
+        print(
+            f"{'*' if r.pareto else ' ':1} {r.backend:<11} {r.input_size:>4} {r.conf_thres:>5.2f} {r.nms_thres:>4.2f} "
+            f"{r.map50:>6.3f} {r.map50_95:>8.3f} {r.precision:>5.2f} {r.recall:>5.2f} {r.occ_acc:>5.3f} "
+            f"{r.latency_ms:>7.1f} {r.p95_ms:>7.1f} {r.fps:>6.1f}"
+        )
+    print(f"* = Pareto-optimal on latency vs {args.metric}")
+
+    if args.csv:
+        Path(args.csv).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            fields = list(Result.__dataclass_fields__)
+            w.writerow(fields)
+            for r in results:
+                w.writerow([getattr(r, k) for k in fields])
+        print(f"Saved: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,79 @@
 import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import cv2
+import numpy as np
+
+from ..video import iter_frames, open_video, video_info
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+# 16x16 gradient signs = 256-bit hash; 8x8 is too coarse to notice a car entering a spot
+_HASH_SIDE = 16
+
+
+def _dhash(bgr: np.ndarray) -> np.ndarray:
+    """Difference hash: sign of horizontal gradients on a small grayscale thumbnail, packed to bytes."""
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (_HASH_SIDE + 1, _HASH_SIDE), interpolation=cv2.INTER_AREA)
+    return np.packbits((small[:, 1:] > small[:, :-1]).flatten())
+
+
+class _Dedup:
+    def __init__(self, max_bits: int):
+        self.max_bits = max_bits
+        self.kept = np.zeros((0, _HASH_SIDE * _HASH_SIDE // 8), dtype=np.uint8)
+
+    def keep(self, h: np.ndarray) -> bool:
+        if self.max_bits < 0:
+            return True
+        if len(self.kept) and _POPCOUNT8[self.kept ^ h].sum(axis=1).min() <= self.max_bits:
+            return False
+        self.kept = np.vstack((self.kept, h))
+        return True
+
+
+def _extract_range(
+    video: str,
+    out_dir: str,
+    start: int,
+    stop: int,
+    every: int,
+    limit: int,
+    dedup_bits: int,
+    jpeg_quality: int,
+    writers: int,
+) -> list[tuple[int, bytes]]:
+    """Save every N-th frame in [start, stop); returns (frame_index, dhash) of saved frames."""
+    cap = open_video(video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {video}")
+    first = (start + every - 1) // every * every
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    dedup = _Dedup(dedup_bits)
+    saved: list[tuple[int, bytes]] = []
+    params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+    with ThreadPoolExecutor(max_workers=max(1, writers)) as pool:
+        futures = []
+        for idx, fr in iter_frames(cap, every=every):
+            if stop and idx >= stop:
+                break
+            h = _dhash(fr)
+            if not dedup.keep(h):
+                continue
+            path = str(Path(out_dir) / f"frame_{idx:06d}.jpg")
+            # cv2.imwrite releases the GIL, so encoding overlaps with decoding
+            futures.append(pool.submit(cv2.imwrite, path, fr, params))
+            saved.append((idx, h.tobytes()))
+            if limit and len(saved) >= limit:
+                break
+        for f in futures:
+            f.result()
+    cap.release()
+    return saved
 
 
 def main() -> None:
@@ -10,29 +82,58 @@ def main() -> None:
     p.add_argument("--out", default="data/dataset/images", help="Output directory")
     p.add_argument("--every", type=int, default=15, help="Save every N-th frame")
     p.add_argument("--max", type=int, default=500, help="Max frames to save")
+    p.add_argument(
+        "--dedup-bits",
+        type=int,
+        default=3,
+        help="Drop frames whose 256-bit perceptual hash is within this Hamming distance of a saved one (-1 = off)",
+    )
+    p.add_argument("--procs", type=int, default=1, help="Split the video into this many frame ranges (processes)")
+    p.add_argument("--writers", type=int, default=4, help="JPEG encode/write threads per process")
+    p.add_argument("--jpeg-quality", type=int, default=95)
     args = p.parse_args()
 
     out_dir = Path(args.out)
     out_dir.mkdir(parents=True, exist_ok=True)
+    every = max(1, args.every)
 
-    cap = cv2.VideoCapture(args.video)
+    cap = open_video(args.video)
     if not cap.isOpened():
         raise SystemExit(f"Cannot open video: {args.video}")
+    n_frames = video_info(cap).frame_count
+    cap.release()
 
-    saved = 0
-    idx = 0
-    while saved < args.max:
-        ok, fr = cap.read()
-        if not ok or fr is None:
-            break
-        if idx % args.every == 0:
-            path = out_dir / f"frame_{idx:06d}.jpg"
-            cv2.imwrite(str(path), fr)
-            saved += 1
-        idx += 1
+    common = dict(
+        every=every,
+        limit=args.max,
+        dedup_bits=args.dedup_bits,
+        jpeg_quality=args.jpeg_quality,
+        writers=args.writers,
+    )
+    procs = max(1, min(args.procs, os.cpu_count() or 1))
+    if procs == 1 or n_frames <= 0:
+        saved = _extract_range(args.video, str(out_dir), 0, 0, **common)
+    else:
+        bounds = np.linspace(0, n_frames, procs + 1).astype(int)
+        with ProcessPoolExecutor(max_workers=procs) as ex:
+            futures = [
+                ex.submit(_extract_range, args.video, str(out_dir), int(a), int(b), **common)
+                for a, b in zip(bounds[:-1], bounds[1:])
+                if b > a
+            ]
+            saved = [x for f in futures for x in f.result()]
 
-    cap.release()
-    print(f"Saved {saved} frames to {out_dir}")
+        # shards dedup and cap independently; redo both across shard boundaries in frame order
+        dedup = _Dedup(args.dedup_bits)
+        kept: list[tuple[int, bytes]] = []
+        for idx, h in sorted(saved):
+            if (args.max and len(kept) >= args.max) or not dedup.keep(np.frombuffer(h, dtype=np.uint8)):
+                (out_dir / f"frame_{idx:06d}.jpg").unlink(missing_ok=True)
+                continue
+            kept.append((idx, h))
+        saved = kept
+
+    print(f"Saved {len(saved)} frames to {out_dir}")
 
 
 if __name__ == "__main__":
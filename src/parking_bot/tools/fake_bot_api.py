@@ -0,0 +1,212 @@
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+from PIL import Image
+
+# Just enough of the Telegram Bot API for parking-bot: lets webhook (and polling) mode be exercised
+# locally with TELEGRAM_API_URL=http://127.0.0.1:<port>. Synthetic photo/video updates are pushed to
+# whatever webhook the bot registers, and the time until the bot answers each one is printed.
+
+
+class FakeBotApi:
+    def __init__(self, out_dir: Path | None):
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.webhook_url: str | None = None
+        self.secret: str | None = None
+        self.webhook_set = threading.Event()
+        self.files: dict[str, Path] = {}
+        self.updates: list[dict] = []  # for getUpdates when no webhook is set
+        self.sent: dict[int, float] = {}  # chat id -> time its update was pushed
+        self.latencies: list[float] = []
+        self.answered = threading.Condition(self.lock)
+        self._ids = 0
+
+    def _next_id(self) -> int:
+        with self.lock:
+            self._ids += 1
+            return self._ids
+
+    def _message(self, chat_id: int, **extra) -> dict:
+        chat = {"id": chat_id, "type": "private"}
+        return {"message_id": self._next_id(), "date": int(time.time()), "chat": chat, **extra}
+
+    def call(self, method: str, params: dict, uploads: dict[str, tuple[str, bytes]]) -> object:
+        chat_id = int(params.get("chat_id", 0) or 0)
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "parking", "username": "parking_test_bot"}
+        if method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.secret = params.get("secret_token")
+            print(f"[api] webhook -> {self.webhook_url}")
+            self.webhook_set.set()
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = None
+            return True
+        if method == "getUpdates":
+            with self.lock:
+                out, self.updates = self.updates, []
+            if not out:
+                time.sleep(min(1.0, float(params.get("timeout", 0) or 0)))
+            return out
+        if method == "getFile":
+            fid = params["file_id"]
+            size = self.files[fid].stat().st_size
+            return {"file_id": fid, "file_unique_id": fid, "file_size": size, "file_path": fid}
+        if method in ("sendPhoto", "sendVideo", "sendDocument"):
+            for name, (filename, data) in uploads.items():
+                if self.out_dir is not None:
+                    self.out_dir.mkdir(parents=True, exist_ok=True)
+                    (self.out_dir / f"{chat_id}_{filename or name}").write_bytes(data)
+            with self.answered:
+                t0 = self.sent.pop(chat_id, None)
+                if t0 is not None:
+                    self.latencies.append(time.perf_counter() - t0)
+                    caption = params.get("caption", "")
+                    print(f"[api] chat {chat_id}: {method} after {self.latencies[-1]:.2f}s | {caption!r}")
+                self.answered.notify_all()
+            return self._message(chat_id, caption=params.get("caption", ""))
+        if method in ("sendMessage", "editMessageText"):
+            print(f"[api] chat {chat_id}: {params.get('text', '')!r}")
+            return self._message(chat_id, text=params.get("text", ""))
+        # sendChatAction, deleteMessage, setMyCommands, ...
+        return True
+
+    def push(self, kind: str, path: Path, chat_id: int) -> None:
+        fid = f"f{self._next_id()}{path.suffix}"
+        self.files[fid] = path
+        media = {"file_id": fid, "file_unique_id": fid}
+        if kind == "photo":
+            with Image.open(path) as im:
+                w, h = im.size
+            msg = self._message(chat_id, photo=[{**media, "width": w, "height": h}])
+        else:
+            msg = self._message(chat_id, video={**media, "width": 0, "height": 0, "duration": 0})
+        msg["from"] = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+        update = {"update_id": self._next_id(), "message": msg}
+        with self.lock:
+            self.sent[chat_id] = time.perf_counter()
+        if self.webhook_url is None:
+            with self.lock:
+                self.updates.append(update)
+            return
+        req = urllib.request.Request(
+            self.webhook_url,
+            data=json.dumps(update).encode("utf-8"),
+            headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": self.secret or ""},
+        )
+        # PTB registers the webhook before its HTTP server accepts connections
+        for attempt in range(20):
+            try:
+                with urllib.request.urlopen(req, timeout=30) as r:
+                    r.read()
+                return
+            except urllib.error.URLError:
+                if attempt == 19:
+                    raise
+                time.sleep(0.25)
+
+
+def _parse_body(ctype: str, body: bytes) -> tuple[dict, dict[str, tuple[str, bytes]]]:
+    if ctype.startswith("application/json"):
+        return (json.loads(body) if body else {}), {}
+    if ctype.startswith("multipart/form-data"):
+        msg = BytesParser(policy=policy.default).parsebytes(b"Content-Type: " + ctype.encode() + b"\r\n\r\n" + body)
+        params, uploads = {}, {}
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            data = part.get_payload(decode=True) or b""
+            if part.get_filename():
+                uploads[name] = (part.get_filename(), data)
+            else:
+                params[name] = data.decode("utf-8")
+        return params, uploads
+    return dict(parse_qsl(body.decode("utf-8"))), {}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Local stand-in for the Telegram Bot API to test parking-bot")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8081)
+    p.add_argument("--photo", default="", help="Push this image as photo updates once the bot is up")
+    p.add_argument("--video", default="", help="Push this video as video updates once the bot is up")
+    p.add_argument("--count", type=int, default=1, help="Updates per kind; each comes from a different user")
+    p.add_argument("--out", default="", help="Save the bot's uploaded replies here")
+    p.add_argument("--wait-webhook", type=float, default=60.0, help="Seconds to wait for setWebhook (0 = polling)")
+    args = p.parse_args()
+
+    api = FakeBotApi(Path(args.out) if args.out else None)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, content_type: str, body: bytes) -> None:
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # /file/bot<token>/<file_path>
+            parts = urlparse(self.path).path.split("/")
+            if len(parts) >= 4 and parts[1] == "file" and parts[3] in api.files:
+                self._send(200, "application/octet-stream", api.files[parts[3]].read_bytes())
+                return
+            self._send(404, "text/plain", b"not found")
+
+        def do_POST(self):
+            # /bot<token>/<method>
+            method = urlparse(self.path).path.rsplit("/", 1)[-1]
+            body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+            params, uploads = _parse_body(self.headers.get("Content-Type", ""), body)
+            try:
+                res = {"ok": True, "result": api.call(method, params, uploads)}
+            except Exception as e:
+                res = {"ok": False, "error_code": 400, "description": f"{type(e).__name__}: {e}"}
+            self._send(200, "application/json", json.dumps(res).encode("utf-8"))
+
+        def log_message(self, format, *args):
+            return
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Fake Bot API on http://{args.host}:{args.port} (set TELEGRAM_API_URL to this)")
+
+    jobs = [("photo", Path(args.photo))] * (args.count if args.photo else 0)
+    jobs += [("video", Path(args.video))] * (args.count if args.video else 0)
+    if not jobs:
+        server.serve_forever()
+        return
+    if args.wait_webhook > 0 and not api.webhook_set.wait(args.wait_webhook):
+        raise SystemExit("The bot did not register a webhook")
+
+    t0 = time.perf_counter()
+    # videos first, so the photos have to get past them
+    order = sorted(enumerate(jobs), key=lambda j: j[1][0] != "video")
+    pushers = [threading.Thread(target=api.push, args=(kind, path, 1000 + i)) for i, (kind, path) in order]
+    for t in pushers:
+        t.start()
+    for t in pushers:
+        t.join()
+    with api.answered:
+        api.answered.wait_for(lambda: not api.sent, timeout=600)
+    lat = sorted(api.latencies)
+    if lat:
+        print(
+            f"{len(lat)}/{len(jobs)} answered in {time.perf_counter() - t0:.1f}s; "
+            f"latency min {lat[0]:.2f}s, median {lat[len(lat) // 2]:.2f}s, max {lat[-1]:.2f}s"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
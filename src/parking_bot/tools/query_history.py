@@ -0,0 +1,47 @@
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime, timezone
+
+from ..config import load_settings
+from ..history import OccupancyStore
+from ..spots import load_spots
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Query the occupancy history store")
+    p.add_argument("query", choices=["free", "hourly"], help="free: free count over time; hourly: per-spot utilisation")
+    p.add_argument("--dir", default=None, help="History store dir (default: HISTORY_DIR)")
+    p.add_argument("--spots", default=None, help="spots.json whose layout to query (default: PARKING_SPOTS_PATH)")
+    p.add_argument("--since-hours", type=float, default=0.0, help="Only the last N hours (0 = everything)")
+    args = p.parse_args()
+
+    settings = load_settings()
+    root = args.dir or settings.history_dir
+    if not root:
+        raise SystemExit("No history dir: pass --dir or set HISTORY_DIR")
+
+    spot_ids = [s.spot_id for s in load_spots(args.spots or settings.spots_path).spots]
+    store = OccupancyStore(root, spot_ids)
+    start = time.time() - args.since_hours * 3600 if args.since_hours > 0 else None
+
+    out = csv.writer(sys.stdout)
+    if args.query == "free":
+        ts, free = store.free_counts(start=start)
+        out.writerow(["time", "free", "total"])
+        for t, f in zip(ts.tolist(), free.tolist()):
+            out.writerow([_iso(t), f, len(spot_ids)])
+    else:
+        hours, util = store.hourly_utilisation(start=start)
+        out.writerow(["hour", *spot_ids])
+        for h, row in zip(hours.tolist(), util.tolist()):
+            out.writerow([_iso(h), *(f"{u:.3f}" for u in row)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ..background import warp_patches
+from ..config import load_settings
+from ..detect import VehicleDetector, centers_from_detections
+from ..spots import load_layout
+from ..video import iter_frames, open_video, video_info
+
+
+def auto_label(
+    detector: VehicleDetector, video: str, spots_path: str, patch: int, every: int, max_frames: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Patches of every spot on every N-th frame, labelled by the detector (center in polygon = occupied).
+
+    Returns (patches [n, patch, patch, 3] uint8, labels [n] uint8, frame index [n]).
+    """
+    cap = open_video(video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {video}")
+    spots, index = load_layout(spots_path).scaled(video_info(cap).size)
+    patches, labels, frames = [], [], []
+    for idx, fr in iter_frames(cap, every=every, max_frames=max_frames):
+        occ = index.occupancy(centers_from_detections(detector.detect(fr, index)))
+        patches.append(warp_patches(fr, spots, patch))
+        labels.append([occ[s.spot_id] for s in spots])
+        frames.append(np.full(len(spots), idx))
+    cap.release()
+    if not patches:
+        raise SystemExit(f"No frames read from {video}")
+    return np.concatenate(patches), np.concatenate(labels).astype(np.uint8), np.concatenate(frames)
+
+
+def _tiny_cnn(nn):
+    # ~6k parameters: three stride-2 convs, global pooling, one logit
+    return nn.Sequential(
+        nn.Conv2d(3, 8, 3, stride=2, padding=1),
+        nn.ReLU(),
+        nn.Conv2d(8, 16, 3, stride=2, padding=1),
+        nn.ReLU(),
+        nn.Conv2d(16, 32, 3, stride=2, padding=1),
+        nn.ReLU(),
+        nn.AdaptiveAvgPool2d(1),
+        nn.Flatten(),
+        nn.Linear(32, 1),
+    )
+
+
+def _to_tensor(torch, patches: np.ndarray):
+    # same preprocessing as cv2.dnn.blobFromImages(..., 1/255, swapRB=True) in SpotClassifier
+    return torch.from_numpy(np.ascontiguousarray(patches[..., ::-1].transpose(0, 3, 1, 2))).float() / 255.0
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Auto-label spot patches with the detector and train a tiny occupancy CNN")
+    p.add_argument("--video", default="video.mp4", help="Video of the lot (same camera as spots.json)")
+    p.add_argument("--every", type=int, default=5, help="Label every N-th frame")
+    p.add_argument("--max-frames", type=int, default=0, help="Max frames to label (0 = all)")
+    p.add_argument("--patch", type=int, default=64, help="Patch side in pixels")
+    p.add_argument("--epochs", type=int, default=20)
+    p.add_argument("--batch", type=int, default=64)
+    p.add_argument("--val-frac", type=float, default=0.2, help="Last part of the video held out for validation")
+    p.add_argument("--cache", default="", help="Save/load auto-labelled patches to/from this .npz")
+    p.add_argument("--out", default="data/models/spot_classifier.onnx", help="Output ONNX (+ .json sidecar)")
+    args = p.parse_args()
+
+    try:
+        import torch
+        from torch import nn
+    except Exception as e:
+        raise SystemExit(
+            "PyTorch is not installed.\n"
+            "Install training extra and retry:\n"
+            "  uv sync --extra train\n"
+        ) from e
+
+    settings = load_settings()
+    if args.cache and Path(args.cache).exists():
+        data = np.load(args.cache)
+        patches, labels, frames = data["patches"], data["labels"], data["frames"]
+    else:
+        det = VehicleDetector(
+            backend=settings.detector_backend,
+            model_dir=settings.model_dir,
+            cfg_name=settings.yolo_cfg,
+            weights_name=settings.yolo_weights,
+            coco_names_name=settings.coco_names,
+            ultralytics_model=settings.ultralytics_model,
+            onnx_model=settings.onnx_model,
+            conf_thres=settings.conf_thres,
+            input_size=settings.input_size,
+        )
+        patches, labels, frames = auto_label(
+            det, args.video, settings.spots_path, args.patch, max(1, args.every), args.max_frames
+        )
+        if args.cache:
+            Path(args.cache).parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(args.cache, patches=patches, labels=labels, frames=frames)
+    print(f"{len(labels)} patches, {int(labels.sum())} occupied")
+
+    # split by time, not at random: neighbouring frames are near-duplicates
+    cut = np.quantile(frames, 1.0 - args.val_frac) if args.val_frac > 0 else frames.max() + 1
+    tr, va = frames < cut, frames >= cut
+    x_tr, y_tr = _to_tensor(torch, patches[tr]), torch.from_numpy(labels[tr]).float()
+    x_va, y_va = _to_tensor(torch, patches[va]), torch.from_numpy(labels[va]).float()
+
+    model = _tiny_cnn(nn)
+    opt = torch.optim.Adam(model.parameters(), lr=3e-3)
+    # occupied and free spots are rarely balanced in one video
+    pos = float(y_tr.sum())
+    loss_fn = nn.BCEWithLogitsLoss(pos_weight=torch.tensor(max(1.0, len(y_tr) - pos) / max(1.0, pos)))
+    for epoch in range(1, args.epochs + 1):
+        model.train()
+        perm = torch.randperm(len(x_tr))
+        total = 0.0
+        for i in range(0, len(perm), args.batch):
+            b = perm[i : i + args.batch]
+            xb = x_tr[b]
+            flip = torch.rand(len(b)) < 0.5
+            xb[flip] = xb[flip].flip(-1)
+            loss = loss_fn(model(xb)[:, 0], y_tr[b])
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            total += float(loss) * len(b)
+        msg = f"epoch {epoch}: loss {total / max(1, len(x_tr)):.4f}"
+        if len(x_va):
+            model.eval()
+            with torch.no_grad():
+                acc = float(((model(x_va)[:, 0] > 0).float() == y_va).float().mean())
+            msg += f", val acc {acc:.3f}"
+        print(msg)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    model.eval()
+    torch.onnx.export(
+        model,
+        torch.zeros(1, 3, args.patch, args.patch),
+        str(out),
+        input_names=["patches"],
+        output_names=["logit"],
+        dynamic_axes={"patches": {0: "n"}, "logit": {0: "n"}},
+        opset_version=12,
+        # the TorchScript exporter: the dynamo one (default since torch 2.9) needs onnxscript, not in the train extra
+        dynamo=False,
+    )
+    out.with_suffix(".json").write_text(json.dumps({"patch": args.patch}), encoding="utf-8")
+    print(f"Saved: {out} (+ {out.with_suffix('.json').name})")
+
+    net = cv2.dnn.readNetFromONNX(str(out))
+    blob = cv2.dnn.blobFromImages(list(patches[: min(len(patches), 256)]), 1 / 255.0, swapRB=True)
+    net.setInput(blob)
+    net.forward()
+    t0 = time.perf_counter()
+    for _ in range(10):
+        net.setInput(blob)
+        net.forward()
+    dt = (time.perf_counter() - t0) / 10
+    print(f"cv2.dnn: {dt * 1e3:.2f} ms per batch of {len(blob)} spots ({dt / len(blob) * 1e6:.0f} us/spot)")
+    print(f"Use it: OCCUPANCY_ENGINE=classifier SPOT_CLASSIFIER={out}")
+
+
+if __name__ == "__main__":
+    main()
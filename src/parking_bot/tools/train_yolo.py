@@ -1,8 +1,77 @@
 import argparse
+import os
+import time
 from pathlib import Path
 
 
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _uses_loader_workers(device: str) -> bool:
+    # Ultralytics forces workers=0 on cpu/mps: the data loader then runs in the training process
+    d = str(device).strip().lower()
+    return not (d.startswith("cpu") or d.startswith("mps"))
+
+
+class _EpochTimer:
+    """Splits each epoch into time spent waiting for the data loader and time spent in the train step."""
+
+    def __init__(self, requested_workers: int):
+        self.rows: list[tuple[int, float, float, int]] = []  # epoch, seconds, stall seconds, batches
+        self.requested_workers = requested_workers
+        self.workers: int | None = None
+        self._epoch_t0 = 0.0
+        self._mark = 0.0
+        self._stall = 0.0
+        self._batches = 0
+
+    def on_pretrain_routine_start(self, trainer) -> None:
+        # what the trainer really uses: it overrides workers on cpu/mps and restores saved args on resume
+        self.workers = int(getattr(trainer.args, "workers", self.requested_workers))
+        if self.workers != self.requested_workers:
+            print(f"[timing] Ultralytics uses workers={self.workers} (requested {self.requested_workers})")
+
+    def on_train_epoch_start(self, trainer) -> None:
+        self._epoch_t0 = self._mark = time.perf_counter()
+        self._stall = 0.0
+        self._batches = 0
+
+    def on_train_batch_start(self, trainer) -> None:
+        # time since the previous step ended was spent fetching this batch
+        now = time.perf_counter()
+        self._stall += now - self._mark
+        self._mark = now
+
+    def on_train_batch_end(self, trainer) -> None:
+        self._mark = time.perf_counter()
+        self._batches += 1
+
+    def on_train_epoch_end(self, trainer) -> None:
+        dt = time.perf_counter() - self._epoch_t0
+        epoch = int(getattr(trainer, "epoch", len(self.rows))) + 1
+        self.rows.append((epoch, dt, self._stall, self._batches))
+        share = self._stall / max(dt, 1e-9)
+        print(f"[timing] epoch {epoch}: {dt:.1f}s, data-loader stall {self._stall:.1f}s ({share:.0%})")
+
+    def report(self) -> None:
+        if not self.rows:
+            return
+        total = sum(r[1] for r in self.rows)
+        stall = sum(r[2] for r in self.rows)
+        print(f"{'epoch':>5} {'sec':>8} {'stall':>8} {'stall %':>8} {'s/batch':>8}")
+        for epoch, dt, st, nb in self.rows:
+            print(f"{epoch:>5} {dt:>8.1f} {st:>8.1f} {st / max(dt, 1e-9):>7.0%} {dt / max(nb, 1):>8.2f}")
+        share = stall / max(total, 1e-9)
+        fix = "use --cache" if self.workers == 0 else "raise --workers / use --cache"
+        verdict = f"I/O-bound ({fix})" if share > 0.3 else "compute-bound"
+        print(f"mean {total / len(self.rows):.1f} s/epoch, stall {share:.0%} -> {verdict}")
+
+
 def main() -> None:
+    cores = _available_cores()
     p = argparse.ArgumentParser(description="Train (fine-tune) YOLO on your parking dataset")
     p.add_argument("--data", required=True, help="Path to dataset YAML (Ultralytics format)")
     p.add_argument("--model", default="yolov8n.pt", help="Base model")
@@ -14,9 +83,33 @@ def main() -> None:
         default="data/runs",
         help="Where to save training runs (default: data/runs). Useful if ./runs is not writable.",
     )
+    p.add_argument("--device", default="cpu")
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, min(8, cores - 1)),
+        help=(
+            f"Data-loader worker processes (default: cores - 1, max 8; {cores} cores here). "
+            "Ignored on cpu/mps: Ultralytics then loads data in the training process"
+        ),
+    )
+    p.add_argument(
+        "--cache",
+        choices=["none", "ram", "disk"],
+        default="none",
+        help="Cache decoded images: ram keeps them pre-resized to --imgsz, disk stores .npy next to images",
+    )
+    p.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="torch intra-op threads (0 = all cores on cpu/mps, cores - workers when loader workers run)",
+    )
+    p.add_argument("--resume", action="store_true", help="Resume the last run from <runs-dir>/detect/weights/last.pt")
     args = p.parse_args()
 
     try:
+        import torch
         from ultralytics import YOLO
     except Exception as e:
         raise SystemExit(
@@ -25,20 +118,51 @@ def main() -> None:
             "  uv sync --extra train\n"
         ) from e
 
-    model = YOLO(args.model)
+    loader_workers = args.workers if _uses_loader_workers(args.device) else 0
+    threads = args.threads or max(1, cores - loader_workers)
+    torch.set_num_threads(threads)
+
     runs_dir = Path(args.runs_dir)
     runs_dir.mkdir(parents=True, exist_ok=True)
-    model.train(
-        data=args.data,
-        epochs=args.epochs,
-        imgsz=args.imgsz,
-        batch=args.batch,
-        workers=2,
-        device="cpu",
-        project=str(runs_dir),
-        name="detect",
-        exist_ok=True,
+
+    timer = _EpochTimer(loader_workers)
+    last = runs_dir / "detect" / "weights" / "last.pt"
+    if args.resume:
+        if not last.exists():
+            raise SystemExit(f"Nothing to resume: {last} not found")
+        model = YOLO(str(last))
+    else:
+        model = YOLO(args.model)
+    events = (
+        "on_pretrain_routine_start",
+        "on_train_epoch_start",
+        "on_train_batch_start",
+        "on_train_batch_end",
+        "on_train_epoch_end",
     )
+    for event in events:
+        model.add_callback(event, getattr(timer, event))
+
+    if loader_workers != args.workers:
+        print(f"--workers {args.workers} has no effect on device={args.device}: Ultralytics sets workers=0 there")
+    print(f"workers={loader_workers} torch_threads={threads} cache={args.cache} device={args.device}")
+    if args.resume:
+        # Ultralytics restores the run's saved args here, workers included; the callback above logs the value used
+        model.train(resume=True, workers=args.workers, device=args.device)
+    else:
+        model.train(
+            data=args.data,
+            epochs=args.epochs,
+            imgsz=args.imgsz,
+            batch=args.batch,
+            workers=args.workers,
+            cache=False if args.cache == "none" else args.cache,
+            device=args.device,
+            project=str(runs_dir),
+            name="detect",
+            exist_ok=True,
+        )
+    timer.report()
 
 
 if __name__ == "__main__":
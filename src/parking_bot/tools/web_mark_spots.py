@@ -1,13 +1,24 @@
 import argparse
+import functools
+import hashlib
+import io
 import json
+import sys
 import threading
+import time
 import webbrowser
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, unquote, urlparse
 
 from PIL import Image
 
+from ..spots import Spot, load_spots, save_spots, scale_spots
+
+TILE = 512
+# the coarsest pyramid level fits in this many pixels and is always loaded whole
+PREVIEW_MAX = 1024
+
 
 HTML = r"""<!doctype html>
 <html>
@@ -17,11 +28,12 @@ HTML = r"""<!doctype html>
   <style>
     body { font-family: system-ui, sans-serif; margin: 16px; }
     .row { display: flex; gap: 16px; }
-    canvas { border: 1px solid #ccc; max-width: 100%; height: auto; }
+    canvas { border: 1px solid #ccc; cursor: crosshair; }
     .panel { min-width: 320px; }
     button { padding: 8px 12px; margin-right: 8px; }
     code { background: #f4f4f4; padding: 2px 6px; border-radius: 4px; }
-    ul { padding-left: 18px; }
+    ul { padding-left: 18px; max-height: 60vh; overflow: auto; }
+    li button { padding: 0 6px; margin-left: 6px; }
   </style>
 </head>
 <body>
@@ -30,7 +42,8 @@ HTML = r"""<!doctype html>
     - Click: add point<br/>
     - <code>n</code>: finish polygon (asks for id)<br/>
     - <code>u</code>: undo last point<br/>
-    - <code>Esc</code>: clear current polygon
+    - <code>Esc</code>: clear current polygon<br/>
+    - Wheel: zoom, drag: pan, <code>0</code>: fit
   </p>
 
   <div class="row">
@@ -57,29 +70,108 @@ const statusEl = document.getElementById('status');
 const listEl = document.getElementById('list');
 const countEl = document.getElementById('count');
 
-let img = new Image();
-let current = []; // [[x,y],...]
-let spots = [];   // [{id, polygon:[[x,y],...]}, ...]
+let meta = null;
+let current = []; // [[x,y],...] in image pixels
+let spots = [];   // [{id, polygon:[[x,y],...], bbox:[x1,y1,x2,y2]}, ...]
+// view: canvas pixel = (image pixel - o) * s
+let view = {s: 1, ox: 0, oy: 0};
+const levelImages = {}; // level -> Image (whole level)
+const tiles = new Map(); // "level/x/y" -> Image
 
 function setStatus(msg) { statusEl.textContent = msg; }
 
+function bbox(points) {
+  const xs = points.map(p => p[0]), ys = points.map(p => p[1]);
+  return [Math.min(...xs), Math.min(...ys), Math.max(...xs), Math.max(...ys)];
+}
+
+function toCanvas(x, y) { return [(x - view.ox) * view.s, (y - view.oy) * view.s]; }
+
+function levelImage(level) {
+  if (!levelImages[level]) {
+    const im = new Image();
+    im.onload = scheduleRedraw;
+    im.src = `/image?level=${level}`;
+    levelImages[level] = im;
+  }
+  return levelImages[level];
+}
+
+function tile(level, tx, ty) {
+  const key = `${level}/${tx}/${ty}`;
+  let im = tiles.get(key);
+  if (!im) {
+    im = new Image();
+    im.onload = scheduleRedraw;
+    im.src = `/tile?level=${level}&x=${tx}&y=${ty}`;
+    tiles.set(key, im);
+    if (tiles.size > 400) tiles.delete(tiles.keys().next().value);
+  }
+  return im;
+}
+
+function drawImageLayer() {
+  // coarsest level first (always whole), then tiles of the level that matches the zoom
+  const coarse = meta.levels[meta.levels.length - 1];
+  const pim = levelImage(coarse.level);
+  if (pim.complete && pim.naturalWidth) {
+    const [x0, y0] = toCanvas(0, 0);
+    ctx.drawImage(pim, x0, y0, meta.width * view.s, meta.height * view.s);
+  }
+  let lv = coarse;
+  for (const l of meta.levels) {
+    if (l.width / meta.width >= view.s) lv = l;  // levels go from full size down
+  }
+  if (lv.level === coarse.level) return;
+  const sc = lv.width / meta.width;
+  const x1 = view.ox * sc, y1 = view.oy * sc;
+  const x2 = (view.ox + canvas.width / view.s) * sc, y2 = (view.oy + canvas.height / view.s) * sc;
+  for (let ty = Math.max(0, Math.floor(y1 / meta.tile)); ty <= Math.min(Math.floor((lv.height - 1) / meta.tile), Math.floor(y2 / meta.tile)); ty++) {
+    for (let tx = Math.max(0, Math.floor(x1 / meta.tile)); tx <= Math.min(Math.floor((lv.width - 1) / meta.tile), Math.floor(x2 / meta.tile)); tx++) {
+      const im = tile(lv.level, tx, ty);
+      if (!im.complete || !im.naturalWidth) continue;
+      const [cx, cy] = toCanvas(tx * meta.tile / sc, ty * meta.tile / sc);
+      ctx.drawImage(im, cx, cy, im.naturalWidth / sc * view.s, im.naturalHeight / sc * view.s);
+    }
+  }
+}
+
+let redrawPending = false;
+function scheduleRedraw() {
+  if (redrawPending) return;
+  redrawPending = true;
+  requestAnimationFrame(() => { redrawPending = false; redraw(); });
+}
+
 function redraw() {
   ctx.clearRect(0,0,canvas.width,canvas.height);
-  ctx.drawImage(img, 0, 0);
+  drawImageLayer();
 
-  // existing spots
-  for (const s of spots) {
-    drawPoly(s.polygon, 'rgba(0,180,0,0.9)', 2);
-    const [cx, cy] = centroid(s.polygon);
-    drawText(s.id, cx, cy, 'rgba(0,180,0,0.95)');
+  // existing spots: only the visible ones, one path for all of them
+  const vx2 = view.ox + canvas.width / view.s, vy2 = view.oy + canvas.height / view.s;
+  const visible = spots.filter(s => s.bbox[2] >= view.ox && s.bbox[0] <= vx2 && s.bbox[3] >= view.oy && s.bbox[1] <= vy2);
+  ctx.beginPath();
+  for (const s of visible) pathPoly(s.polygon, true);
+  ctx.strokeStyle = 'rgba(0,180,0,0.9)';
+  ctx.lineWidth = 2;
+  ctx.stroke();
+  if (visible.length <= 400) {
+    for (const s of visible) {
+      const [cx, cy] = centroid(s.polygon);
+      drawText(s.id, ...toCanvas(cx, cy), 'rgba(0,180,0,0.95)');
+    }
   }
 
   // current
   if (current.length) {
-    drawPoly(current, 'rgba(220,0,0,0.9)', 2, false);
+    ctx.beginPath();
+    pathPoly(current, false);
+    ctx.strokeStyle = 'rgba(220,0,0,0.9)';
+    ctx.stroke();
     for (const [x,y] of current) {
+      const [cx, cy] = toCanvas(x, y);
       ctx.beginPath();
-      ctx.arc(x,y,3,0,Math.PI*2);
+      ctx.arc(cx,cy,3,0,Math.PI*2);
       ctx.fillStyle = 'rgba(220,0,0,0.9)';
       ctx.fill();
     }
@@ -95,15 +187,11 @@ function drawText(text, x, y, color) {
   ctx.fillText(text, x+4, y-4);
 }
 
-function drawPoly(points, color, width, closed=true) {
+function pathPoly(points, closed) {
   if (!points || points.length < 2) return;
-  ctx.beginPath();
-  ctx.moveTo(points[0][0], points[0][1]);
-  for (let i=1;i<points.length;i++) ctx.lineTo(points[i][0], points[i][1]);
+  ctx.moveTo(...toCanvas(points[0][0], points[0][1]));
+  for (let i=1;i<points.length;i++) ctx.lineTo(...toCanvas(points[i][0], points[i][1]));
   if (closed) ctx.closePath();
-  ctx.strokeStyle = color;
-  ctx.lineWidth = width;
-  ctx.stroke();
 }
 
 function centroid(points) {
@@ -114,30 +202,96 @@ function centroid(points) {
 
 function refreshList() {
   listEl.innerHTML = '';
-  for (const s of spots) {
+  for (const s of spots.slice(0, 1000)) {
     const li = document.createElement('li');
     li.textContent = `${s.id} (${s.polygon.length} pts)`;
+    const del = document.createElement('button');
+    del.textContent = '×';
+    del.onclick = () => deleteSpot(s.id);
+    li.appendChild(del);
     listEl.appendChild(li);
   }
   countEl.textContent = String(spots.length);
 }
 
-canvas.addEventListener('click', (ev) => {
+async function api(method, url, body) {
+  const r = await fetch(url, {
+    method,
+    headers: {'Content-Type':'application/json'},
+    body: body === undefined ? undefined : JSON.stringify(body),
+  });
+  if (!r.ok) throw new Error(await r.text());
+  return r.json();
+}
+
+async function addSpot(sid, polygon) {
+  const res = await api('POST', '/spots', {id: sid, polygon});
+  spots = spots.filter(s => s.id !== sid);
+  spots.push({id: sid, polygon, bbox: bbox(polygon)});
+  refreshList();
+  scheduleRedraw();
+  setStatus(`Added spot ${sid} (${res.count} total)`);
+}
+
+async function deleteSpot(sid) {
+  const res = await api('DELETE', '/spots/' + encodeURIComponent(sid));
+  spots = spots.filter(s => s.id !== sid);
+  refreshList();
+  scheduleRedraw();
+  setStatus(`Deleted spot ${sid} (${res.count} total)`);
+}
+
+function imagePoint(ev) {
   const rect = canvas.getBoundingClientRect();
-  const x = Math.round((ev.clientX - rect.left) * (canvas.width / rect.width));
-  const y = Math.round((ev.clientY - rect.top) * (canvas.height / rect.height));
-  current.push([x,y]);
-  redraw();
+  const cx = (ev.clientX - rect.left) * (canvas.width / rect.width);
+  const cy = (ev.clientY - rect.top) * (canvas.height / rect.height);
+  return [view.ox + cx / view.s, view.oy + cy / view.s];
+}
+
+let drag = null;
+canvas.addEventListener('mousedown', (ev) => { drag = {x: ev.clientX, y: ev.clientY, ox: view.ox, oy: view.oy, moved: false}; });
+window.addEventListener('mousemove', (ev) => {
+  if (!drag) return;
+  const dx = ev.clientX - drag.x, dy = ev.clientY - drag.y;
+  if (Math.abs(dx) + Math.abs(dy) > 3) drag.moved = true;
+  if (drag.moved) {
+    view.ox = drag.ox - dx / view.s;
+    view.oy = drag.oy - dy / view.s;
+    scheduleRedraw();
+  }
+});
+window.addEventListener('mouseup', () => { setTimeout(() => { drag = null; }, 0); });
+
+canvas.addEventListener('click', (ev) => {
+  if (drag && drag.moved) return;
+  const [x, y] = imagePoint(ev);
+  current.push([Math.round(x), Math.round(y)]);
+  scheduleRedraw();
 });
 
-document.addEventListener('keydown', (ev) => {
+canvas.addEventListener('wheel', (ev) => {
+  ev.preventDefault();
+  const [x, y] = imagePoint(ev);
+  const fit = canvas.width / meta.width;
+  view.s = Math.min(8, Math.max(fit, view.s * (ev.deltaY < 0 ? 1.25 : 0.8)));
+  const rect = canvas.getBoundingClientRect();
+  view.ox = x - (ev.clientX - rect.left) / view.s;
+  view.oy = y - (ev.clientY - rect.top) / view.s;
+  scheduleRedraw();
+}, {passive: false});
+
+document.addEventListener('keydown', async (ev) => {
   if (ev.key === 'u') {
     current.pop();
-    redraw();
+    scheduleRedraw();
   }
   if (ev.key === 'Escape') {
     current = [];
-    redraw();
+    scheduleRedraw();
+  }
+  if (ev.key === '0') {
+    view = {s: canvas.width / meta.width, ox: 0, oy: 0};
+    scheduleRedraw();
   }
   if (ev.key === 'n') {
     if (current.length < 3) {
@@ -145,46 +299,45 @@ document.addEventListener('keydown', (ev) => {
       return;
     }
     const sid = prompt('Spot id (e.g. A1):', `spot_${spots.length+1}`) || `spot_${spots.length+1}`;
-    spots.push({id: sid, polygon: current});
+    if (spots.some(s => s.id === sid) && !confirm(`Replace spot ${sid}?`)) return;
+    const poly = current;
     current = [];
-    refreshList();
-    redraw();
-    setStatus('Added spot ' + sid);
+    try {
+      await addSpot(sid, poly);
+    } catch (e) {
+      current = poly;
+      setStatus('Error: ' + e.message);
+    }
   }
 });
 
-document.getElementById('clear').addEventListener('click', () => {
+document.getElementById('clear').addEventListener('click', async () => {
   if (!confirm('Clear all spots?')) return;
+  await api('POST', '/save', {spots: []});
   spots = [];
   current = [];
   refreshList();
-  redraw();
+  scheduleRedraw();
 });
 
 document.getElementById('save').addEventListener('click', async () => {
-  const payload = {
-    spots,
-    // image_size will be filled by server
-  };
-  const r = await fetch('/save', {
-    method: 'POST',
-    headers: {'Content-Type':'application/json'},
-    body: JSON.stringify(payload),
-  });
-  const t = await r.text();
-  setStatus(t);
+  // every change is already stored; this only forces the pending write to disk now
+  const res = await api('POST', '/flush');
+  setStatus(`Saved: ${res.path} (${res.count} spots)`);
 });
 
 async function init() {
-  const r = await fetch('/meta');
-  const meta = await r.json();
-  img.onload = () => {
-    canvas.width = img.width;
-    canvas.height = img.height;
-    redraw();
-  };
-  img.src = '/image';
-  setStatus(`Image: ${meta.width}x${meta.height}`);
+  meta = await api('GET', '/meta');
+  const data = await api('GET', '/spots');
+  spots = data.spots.map(s => ({...s, bbox: bbox(s.polygon)}));
+  const maxW = Math.max(320, window.innerWidth - 400);
+  const fit = Math.min(1, maxW / meta.width);
+  canvas.width = Math.round(meta.width * fit);
+  canvas.height = Math.round(meta.height * fit);
+  view = {s: fit, ox: 0, oy: 0};
+  refreshList();
+  scheduleRedraw();
+  setStatus(`Image: ${meta.width}x${meta.height}, ${spots.length} spots loaded`);
 }
 
 init();
@@ -194,10 +347,129 @@ init();
 """
 
 
+class ImagePyramid:
+    """Frame at full size plus halvings down to PREVIEW_MAX; levels and tiles are encoded once and cached."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.raw = path.read_bytes()
+        self.etag = hashlib.sha1(self.raw).hexdigest()[:16]
+        self.ctype = "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+        img = Image.open(io.BytesIO(self.raw))
+        self.size = img.size
+        self.levels = [img.convert("RGB")]
+        while max(self.levels[-1].size) > PREVIEW_MAX:
+            w, h = self.levels[-1].size
+            self.levels.append(self.levels[-1].resize((max(1, w // 2), max(1, h // 2)), Image.Resampling.BOX))
+
+    def meta(self) -> dict:
+        return {
+            "width": self.size[0],
+            "height": self.size[1],
+            "tile": TILE,
+            "levels": [{"level": i, "width": im.size[0], "height": im.size[1]} for i, im in enumerate(self.levels)],
+        }
+
+    @staticmethod
+    def _jpeg(img: Image.Image) -> bytes:
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=85)
+        return buf.getvalue()
+
+    @functools.lru_cache(maxsize=16)
+    def level(self, level: int) -> tuple[str, bytes]:
+        if level == 0:
+            return self.ctype, self.raw
+        return "image/jpeg", self._jpeg(self.levels[level])
+
+    @functools.lru_cache(maxsize=512)
+    def tile(self, level: int, tx: int, ty: int) -> tuple[str, bytes]:
+        img = self.levels[level]
+        w, h = img.size
+        x1, y1 = tx * TILE, ty * TILE
+        if x1 >= w or y1 >= h:
+            raise KeyError((level, tx, ty))
+        return "image/jpeg", self._jpeg(img.crop((x1, y1, min(w, x1 + TILE), min(h, y1 + TILE))))
+
+
+class SpotStore:
+    """Spots being edited, keyed by id. Changes are O(1) in memory; a background thread rewrites the
+    file atomically (temp file + rename), coalescing bursts of edits into one write."""
+
+    def __init__(self, path: Path, image_size: tuple[int, int], delay_s: float = 0.5):
+        self.path = path
+        self.image_size = image_size
+        self.delay_s = delay_s
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.spots: dict[str, list[list[int]]] = {}
+        if path.exists():
+            cfg = load_spots(path)
+            for s in scale_spots(cfg, image_size):
+                self.spots[s.spot_id] = [[x, y] for x, y in s.polygon]
+        self._dirty = threading.Event()
+        threading.Thread(target=self._writer, daemon=True).start()
+
+    def as_list(self) -> list[dict]:
+        with self.lock:
+            return [{"id": sid, "polygon": poly} for sid, poly in self.spots.items()]
+
+    @staticmethod
+    def _polygon(polygon: list) -> list[list[int]]:
+        poly = [[int(round(float(x))), int(round(float(y)))] for x, y in polygon]
+        if len(poly) < 3:
+            raise ValueError("polygon needs at least 3 points")
+        return poly
+
+    def upsert(self, sid: str, polygon: list) -> int:
+        poly = self._polygon(polygon)
+        with self.lock:
+            self.spots[sid] = poly
+            n = len(self.spots)
+        self._dirty.set()
+        return n
+
+    def delete(self, sid: str) -> int:
+        with self.lock:
+            if sid not in self.spots:
+                raise KeyError(sid)
+            del self.spots[sid]
+            n = len(self.spots)
+        self._dirty.set()
+        return n
+
+    def replace_all(self, spots: list[dict]) -> int:
+        # validate everything first: a bad spot must not leave the store (and then the file) half-replaced
+        new = {str(s["id"]): self._polygon(s["polygon"]) for s in spots}
+        with self.lock:
+            self.spots = new
+        self._dirty.set()
+        return len(new)
+
+    def flush(self) -> None:
+        # the /flush handler and the background writer may both get here
+        with self.write_lock:
+            with self.lock:
+                self._dirty.clear()
+                items = list(self.spots.items())
+            save_spots(self.path, [Spot(spot_id=sid, polygon=poly) for sid, poly in items], self.image_size)
+
+    def _writer(self) -> None:
+        while True:
+            self._dirty.wait()
+            # let a burst of edits settle, then write once
+            time.sleep(self.delay_s)
+            try:
+                self.flush()
+            except Exception as e:
+                # keep the writer alive; the spots stay in memory and the next edit retries
+                print(f"Cannot save {self.path}: {type(e).__name__}: {e}", file=sys.stderr)
+
+
 def main() -> None:
     p = argparse.ArgumentParser(description="Mark parking spots in browser (no OpenCV GUI)")
     p.add_argument("--image", required=True, help="Path to frame image")
-    p.add_argument("--out", default="data/spots.json", help="Output JSON file")
+    p.add_argument("--out", default="data/spots.json", help="Output JSON file (existing spots are loaded for editing)")
     p.add_argument("--host", default="127.0.0.1")
     p.add_argument("--port", type=int, default=8000)
     p.add_argument("--no-open", action="store_true", help="Do not auto-open browser")
@@ -210,52 +482,103 @@ def main() -> None:
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    w, h = Image.open(img_path).size
+    pyramid = ImagePyramid(img_path)
+    store = SpotStore(out_path, pyramid.size)
+    meta_body = json.dumps(pyramid.meta()).encode("utf-8")
 
     class Handler(BaseHTTPRequestHandler):
-        def _send(self, code: int, content_type: str, body: bytes) -> None:
+        def _send(self, code: int, content_type: str, body: bytes, etag: str | None = None) -> None:
             self.send_response(code)
             self.send_header("Content-Type", content_type)
             self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
             self.end_headers()
             self.wfile.write(body)
 
+        def _send_json(self, obj, code: int = 200) -> None:
+            self._send(code, "application/json", json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+        def _send_cached(self, etag: str, content_type: str, body: bytes) -> None:
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self._send(200, content_type, body, etag=etag)
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length", "0"))
+            return json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+
         def do_GET(self):
-            path = urlparse(self.path).path
+            url = urlparse(self.path)
+            path = url.path
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
             if path == "/" or path == "/index.html":
                 self._send(200, "text/html; charset=utf-8", HTML.encode("utf-8"))
                 return
             if path == "/meta":
-                self._send(200, "application/json", json.dumps({"width": w, "height": h}).encode("utf-8"))
+                self._send(200, "application/json", meta_body)
                 return
-            if path == "/image":
-                data = img_path.read_bytes()
-                ctype = "image/png" if img_path.suffix.lower() == ".png" else "image/jpeg"
-                self._send(200, ctype, data)
+            if path == "/spots":
+                self._send_json({"spots": store.as_list()})
+                return
+            try:
+                if path == "/image":
+                    level = int(q.get("level", 0))
+                    ctype, body = pyramid.level(level)
+                    self._send_cached(f'"{pyramid.etag}-{level}"', ctype, body)
+                    return
+                if path == "/tile":
+                    level, tx, ty = int(q["level"]), int(q["x"]), int(q["y"])
+                    ctype, body = pyramid.tile(level, tx, ty)
+                    self._send_cached(f'"{pyramid.etag}-{level}-{tx}-{ty}"', ctype, body)
+                    return
+            except (KeyError, IndexError, ValueError):
+                self._send(404, "text/plain; charset=utf-8", b"No such level/tile")
                 return
             self._send(404, "text/plain; charset=utf-8", b"Not found")
 
         def do_POST(self):
             path = urlparse(self.path).path
-            if path != "/save":
-                self._send(404, "text/plain; charset=utf-8", b"Not found")
+            try:
+                if path == "/spots":
+                    data = self._body()
+                    self._send_json({"count": store.upsert(str(data["id"]), data["polygon"])})
+                    return
+                if path == "/save":
+                    # full replace, as the old single-request editor did
+                    self._send_json({"count": store.replace_all(self._body().get("spots", []))})
+                    return
+                if path == "/flush":
+                    store.flush()
+                    self._send_json({"path": str(out_path), "count": len(store.spots)})
+                    return
+            except (KeyError, TypeError, ValueError) as e:
+                self._send(400, "text/plain; charset=utf-8", f"Bad request: {e}".encode("utf-8"))
                 return
+            self._send(404, "text/plain; charset=utf-8", b"Not found")
 
-            length = int(self.headers.get("Content-Length", "0"))
-            raw = self.rfile.read(length)
-            data = json.loads(raw.decode("utf-8"))
-            spots = data.get("spots", [])
-
-            payload = {"image_size": [w, h], "spots": spots}
-            out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-            self._send(200, "text/plain; charset=utf-8", f"Saved: {out_path}".encode("utf-8"))
+        def do_DELETE(self):
+            path = urlparse(self.path).path
+            if not path.startswith("/spots/"):
+                self._send(404, "text/plain; charset=utf-8", b"Not found")
+                return
+            sid = unquote(path[len("/spots/") :])
+            try:
+                self._send_json({"count": store.delete(sid)})
+            except KeyError:
+                self._send(404, "text/plain; charset=utf-8", f"No spot {sid}".encode("utf-8"))
 
         def log_message(self, format, *args):
             return
 
-    server = HTTPServer((args.host, args.port), Handler)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
     url = f"http://{args.host}:{args.port}/"
     print(f"Open: {url}")
+    print(f"Image {pyramid.size[0]}x{pyramid.size[1]}, {len(pyramid.levels)} levels, {len(store.spots)} spots loaded")
     print("Press Ctrl+C to stop")
 
     if not args.no_open:
@@ -267,6 +590,7 @@ def main() -> None:
         pass
     finally:
         server.server_close()
+        store.flush()
 
 
 if __name__ == "__main__":